@@ -9,11 +9,15 @@ import random
 import time
 import uuid
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Sequence, Tuple
+from types import MappingProxyType
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
 import logging
 
 import requests
+from requests.adapters import HTTPAdapter
 from fastapi import Depends, FastAPI, HTTPException
 from fastapi.responses import FileResponse, JSONResponse
 from pydantic import BaseModel
@@ -30,6 +34,7 @@ from solders.compute_budget import set_compute_unit_limit
 from solana.rpc.api import Client as SolanaClient
 from solana.rpc.types import TxOpts, MemcmpOpts
 from sqlalchemy import Index, and_, or_, text
+from sqlalchemy.engine import make_url
 from sqlmodel import Field, Session, SQLModel, create_engine, select, func
 
 from smart_price_scheduler import start_smart_price_scheduler
@@ -128,7 +133,19 @@ STATIC_ASSET_ROOT = Path(getattr(auth_settings, "static_asset_root", DEFAULT_STA
 ASSET_BASE_URL = (getattr(auth_settings, "asset_base_url", DEFAULT_ASSET_BASE_URL) or DEFAULT_ASSET_BASE_URL).rstrip("/")
 
 
-engine = create_engine(auth_settings.database_url)
+def engine_options(database_url: str) -> dict:
+    """Driver-specific create_engine kwargs; psycopg2 batches executemany INSERT/UPDATEs into multi-row statements.
+
+    Only executemany paths benefit (ORM flushes, bulk_insert_mappings/bulk_update_mappings); single
+    multi-VALUES upserts are already one statement. Scripts with their own engine should pass these too.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() == "postgresql" and url.get_driver_name() == "psycopg2":
+        return {"executemany_mode": "values_plus_batch", "insertmanyvalues_page_size": 10_000}
+    return {}
+
+
+engine = create_engine(auth_settings.database_url, **engine_options(auth_settings.database_url))
 # Prefer Helius RPC if provided to improve reliability.
 rpc_url = auth_settings.helius_rpc_url or auth_settings.solana_rpc
 sol_client = SolanaClient(rpc_url)
@@ -2626,38 +2643,59 @@ def listing_owner_from_chain(vault_state: Pubkey, core_asset: Pubkey) -> Optiona
     return Pubkey.from_bytes(seller_bytes)
 
 
-def helius_get_assets(owner: str, collection: Optional[str]) -> List[dict]:
+HELIUS_PAGE_LIMIT = 100
+# getAssetsByOwner does not report a page count, so pages are requested in waves of this size.
+HELIUS_PAGE_CONCURRENCY = 4
+# Shared keep-alive session for Helius DAS calls so paginated/enrichment requests reuse TCP+TLS connections.
+_HELIUS_HTTP = requests.Session()
+_HELIUS_HTTP.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=16))
+
+
+def helius_get_assets_page(owner: str, collection: Optional[str], page: int, limit: int = HELIUS_PAGE_LIMIT) -> List[dict]:
+    body = {
+        "jsonrpc": "2.0",
+        "id": f"mochi-{page}",
+        "method": "getAssetsByOwner",
+        "params": {
+            "ownerAddress": owner,
+            "page": page,
+            "limit": limit,
+            "options": {"showUnverifiedCollections": False},
+        },
+    }
+    if collection:
+        body["params"]["displayOptions"] = {"showCollectionMetadata": True}
+        body["params"]["grouping"] = ["collection", collection]
+    resp = _HELIUS_HTTP.post(auth_settings.helius_rpc_url, json=body, timeout=15)
+    resp.raise_for_status()
+    data = resp.json()
+    return data.get("result", {}).get("items", []) or []
+
+
+def helius_iter_asset_pages(owner: str, collection: Optional[str]) -> Iterator[List[dict]]:
+    """Yield getAssetsByOwner pages in order, so callers can process big vaults without holding every asset."""
     if not auth_settings.helius_rpc_url:
-        return []
-    page = 1
-    limit = 100
-    items: List[dict] = []
-    while True:
-        body = {
-            "jsonrpc": "2.0",
-            "id": f"mochi-{page}",
-            "method": "getAssetsByOwner",
-            "params": {
-                "ownerAddress": owner,
-                "page": page,
-                "limit": limit,
-                "options": {"showUnverifiedCollections": False},
-            },
-        }
-        if collection:
-            body["params"]["displayOptions"] = {"showCollectionMetadata": True}
-            body["params"]["grouping"] = ["collection", collection]
-        resp = requests.post(auth_settings.helius_rpc_url, json=body, timeout=15)
-        resp.raise_for_status()
-        data = resp.json()
-        chunk = data.get("result", {}).get("items", []) or []
-        if not chunk:
-            break
-        items.extend(chunk)
-        if len(chunk) < limit:
-            break
-        page += 1
-    return items
+        return
+    limit = HELIUS_PAGE_LIMIT
+    first = helius_get_assets_page(owner, collection, 1, limit)
+    if first:
+        yield first
+    if len(first) < limit:
+        return
+    page = 2
+    with ThreadPoolExecutor(max_workers=HELIUS_PAGE_CONCURRENCY) as pool:
+        while True:
+            wave = range(page, page + HELIUS_PAGE_CONCURRENCY)
+            for chunk in pool.map(lambda p: helius_get_assets_page(owner, collection, p, limit), wave):
+                if chunk:
+                    yield chunk
+                if len(chunk) < limit:
+                    return
+            page += HELIUS_PAGE_CONCURRENCY
+
+
+def helius_get_assets(owner: str, collection: Optional[str]) -> List[dict]:
+    return [item for chunk in helius_iter_asset_pages(owner, collection) for item in chunk]
 
 
 @app.on_event("startup")
@@ -4282,7 +4320,7 @@ def marketplace_listings(db: Session = Depends(get_session)):
             return None
         try:
             payload = {"jsonrpc": "2.0", "id": f"listing-{asset_id}", "method": "getAsset", "params": {"id": asset_id}}
-            resp = requests.post(auth_settings.helius_rpc_url, json=payload, timeout=10)
+            resp = _HELIUS_HTTP.post(auth_settings.helius_rpc_url, json=payload, timeout=10)
             resp.raise_for_status()
             return resp.json().get("result")
         except Exception:
@@ -5854,13 +5892,21 @@ def admin_inventory_unreserve(req: UnreserveRequest, db: Session = Depends(get_s
     return {"unreserved": len(rows), "sessions_marked": len(affected_sessions)}
 
 
+_URI_DIGITS_RE = re.compile(r"(\d+)")
+# Read-only stand-in for a missing DAS "content" block, so the inventory loop doesn't allocate a dict per asset.
+_EMPTY = MappingProxyType({})
+
+
+@lru_cache(maxsize=4096)
 def template_id_from_uri(uri: str) -> Optional[int]:
     if not uri:
         return None
-    matches = re.findall(r"(\d+)", uri)
-    if matches:
+    # The template id is the last run of digits; scanning the reversed URI finds it with a single
+    # match instead of collecting every run with findall.
+    match = _URI_DIGITS_RE.search(uri[::-1])
+    if match:
         try:
-            return int(matches[-1])
+            return int(match.group()[::-1])
         except ValueError:
             return None
     return None
@@ -5872,14 +5918,16 @@ def admin_inventory_refresh(db: Session = Depends(get_session)):
     vault_authority = vault_authority_pda(vault_state)
     if not auth_settings.helius_rpc_url:
         raise HTTPException(status_code=400, detail="HELIUS_RPC_URL not configured")
-    assets = helius_get_assets(str(vault_authority), auth_settings.core_collection_address)
+    vault_owner = str(vault_authority)
+    assets = helius_get_assets(vault_owner, auth_settings.core_collection_address)
     updated: List[str] = []
     for item in assets:
         asset_id = item.get("id")
         if not asset_id:
             continue
-        content = item.get("content", {}) or {}
-        uri = content.get("json_uri") or content.get("links", {}).get("json")
+        content = item.get("content") or _EMPTY
+        links = content.get("links")
+        uri = content.get("json_uri") or (links.get("json") if links else None)
         tmpl_id = template_id_from_uri(uri or "")
         template_row = db.get(CardTemplate, tmpl_id) if tmpl_id else None
         rarity = "unknown"
@@ -5887,7 +5935,7 @@ def admin_inventory_refresh(db: Session = Depends(get_session)):
             rarity = template_row.rarity
         existing = db.get(MintRecord, asset_id)
         if existing:
-            existing.owner = str(vault_authority)
+            existing.owner = vault_owner
             existing.status = "available"
             existing.updated_at = time.time()
             if tmpl_id and existing.template_id != tmpl_id:
@@ -5903,14 +5951,14 @@ def admin_inventory_refresh(db: Session = Depends(get_session)):
                     template_id=tmpl_id or 0,
                     rarity=rarity,
                     status="available",
-                    owner=str(vault_authority),
+                    owner=vault_owner,
                     updated_at=time.time(),
                     is_fake=False,
                 )
             )
         updated.append(asset_id)
     db.commit()
-    return InventoryRefreshResponse(owner=str(vault_authority), count=len(updated), updated=updated)
+    return InventoryRefreshResponse(owner=vault_owner, count=len(updated), updated=updated)
 
 
 if __name__ == "__main__":
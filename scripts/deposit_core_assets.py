@@ -4,8 +4,9 @@ Requires: anchorpy, solders; RPC with Helius recommended.
 """
 import asyncio
 from pathlib import Path
+from typing import Dict, List, Set, Tuple
 
-from anchorpy import Program, Provider, Wallet, Context
+from anchorpy import Program, Wallet, Context
 from anchorpy import Idl
 from solders.keypair import Keypair
 from solders.pubkey import Pubkey
@@ -19,10 +20,15 @@ import os
 import sys
 sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
 from main import MintRecord, auth_settings  # type: ignore
+from rpc_client import close_clients, get_client, make_provider, send_with_blockhash_retry
 
 PROGRAM_ID = Pubkey.from_string("Gc7u33eCs81jPcfzgX4nh6xsiEtRYuZUyHKFjmf5asfx")
 IDL_PATH = Path(__file__).resolve().parents[1] / "anchor-program" / "idl" / "mochi_v2_vault.json"
 KEY_PATH = Path(__file__).resolve().parents[1] / "anchor-program" / "keys" / "passkey.json"
+# Sidecar cache of CardRecord PDA bumps so re-runs skip the find_program_address bump search.
+PDA_CACHE_PATH = Path(os.environ.get("DEPOSIT_PDA_CACHE", Path(__file__).resolve().parent / ".deposit_pda_cache.json"))
+# getMultipleAccounts accepts at most 100 pubkeys per call
+MULTIPLE_ACCOUNTS_LIMIT = 100
 
 
 def load_idl() -> Idl:
@@ -37,12 +43,68 @@ def load_wallet() -> Wallet:
     return Wallet(kp)
 
 
-async def deposit_one(program: Program, mint: MintRecord, vault_state: Pubkey):
+def load_bump_cache(vault_state: Pubkey) -> Dict[str, int]:
+    try:
+        data = json.loads(PDA_CACHE_PATH.read_text())
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("vault_state") != str(vault_state):
+        return {}
+    return data.get("bumps") or {}
+
+
+def save_bump_cache(vault_state: Pubkey, bumps: Dict[str, int]) -> None:
+    try:
+        PDA_CACHE_PATH.write_text(json.dumps({"vault_state": str(vault_state), "bumps": bumps}))
+    except OSError as exc:
+        print(f"Could not write PDA cache {PDA_CACHE_PATH}: {exc}")
+
+
+def card_record_pda(vault_state: Pubkey, core_asset: Pubkey, bumps: Dict[str, int]) -> Pubkey:
+    """Derive the CardRecord PDA, reusing a cached bump when one is known."""
+    seeds = [b"card_record", bytes(vault_state), bytes(core_asset)]
+    key = str(core_asset)
+    bump = bumps.get(key)
+    if bump is not None:
+        return Pubkey.create_program_address(seeds + [bytes([bump])], PROGRAM_ID)
+    pda, bumps[key] = Pubkey.find_program_address(seeds, PROGRAM_ID)
+    return pda
+
+
+async def filter_undeposited(
+    client: AsyncClient, rows: List[MintRecord], vault_state: Pubkey
+) -> List[Tuple[MintRecord, Pubkey]]:
+    """Drop duplicate assets and assets whose CardRecord already exists on-chain.
+
+    CardRecord PDAs are checked in batches via getMultipleAccounts instead of one
+    deposit attempt (or one getAccountInfo) per asset.
+    """
+    bumps = load_bump_cache(vault_state)
+    cached = len(bumps)
+    seen: Set[str] = set()
+    pending: List[Tuple[MintRecord, Pubkey]] = []
+    for mint in rows:
+        if mint.asset_id in seen:
+            continue
+        seen.add(mint.asset_id)
+        pending.append((mint, card_record_pda(vault_state, Pubkey.from_string(mint.asset_id), bumps)))
+    if len(bumps) != cached:
+        save_bump_cache(vault_state, bumps)
+
+    to_deposit: List[Tuple[MintRecord, Pubkey]] = []
+    for start in range(0, len(pending), MULTIPLE_ACCOUNTS_LIMIT):
+        chunk = pending[start : start + MULTIPLE_ACCOUNTS_LIMIT]
+        resp = await client.get_multiple_accounts([card_record for _, card_record in chunk])
+        for (mint, card_record), info in zip(chunk, resp.value):
+            if info is None:
+                to_deposit.append((mint, card_record))
+    return to_deposit
+
+
+async def deposit_one(
+    program: Program, mint: MintRecord, vault_state: Pubkey, vault_authority: Pubkey, card_record: Pubkey
+):
     core_asset = Pubkey.from_string(mint.asset_id)
-    card_record, _bump = Pubkey.find_program_address(
-        [b"card_record", bytes(vault_state), bytes(core_asset)], program.program_id
-    )
-    vault_authority, _ = Pubkey.find_program_address([b"vault_authority", bytes(vault_state)], program.program_id)
     admin = program.provider.wallet.payer
     ctx = Context(
         accounts={
@@ -54,26 +116,30 @@ async def deposit_one(program: Program, mint: MintRecord, vault_state: Pubkey):
             "system_program": Pubkey.from_string("11111111111111111111111111111111"),
         }
     )
-    await program.rpc["deposit_card"](mint.template_id, mint.rarity, ctx=ctx)
+    await send_with_blockhash_retry(
+        program.provider.connection, lambda: program.rpc["deposit_card"](mint.template_id, mint.rarity, ctx=ctx)
+    )
 
 
 async def main():
     idl = load_idl()
     wallet = load_wallet()
-    client = AsyncClient(auth_settings.solana_rpc)
-    provider = Provider(client, wallet)
+    client = get_client(auth_settings.solana_rpc)
+    provider = make_provider(client, wallet)
     program = Program(idl, PROGRAM_ID, provider)
 
     vault_state = Pubkey.find_program_address([b"vault_state"], PROGRAM_ID)[0]
+    vault_authority = Pubkey.find_program_address([b"vault_authority", bytes(vault_state)], PROGRAM_ID)[0]
     engine = create_engine(auth_settings.database_url)
     SQLModel.metadata.create_all(engine)
     with Session(engine) as session:
         stmt = select(MintRecord).where(MintRecord.status == "available")
         rows = session.exec(stmt).all()
-    print(f"Depositing {len(rows)} assets into vault...")
-    for mint in rows:
-        await deposit_one(program, mint, vault_state)
-    await client.close()
+    to_deposit = await filter_undeposited(client, rows, vault_state)
+    print(f"Depositing {len(to_deposit)} assets into vault ({len(rows) - len(to_deposit)} already deposited or duplicate)...")
+    for mint, card_record in to_deposit:
+        await deposit_one(program, mint, vault_state, vault_authority, card_record)
+    await close_clients()
 
 
 if __name__ == "__main__":
@@ -1,13 +1,14 @@
 import asyncio
 import json
 from pathlib import Path
+from types import MappingProxyType
 from typing import List, Tuple
 
-from anchorpy import Context, Idl, Program, Provider, Wallet
-from solana.rpc.async_api import AsyncClient
-from solana.rpc.commitment import Confirmed
+from anchorpy import Context, Idl, Program, Wallet
 from solders.keypair import Keypair
 from solders.pubkey import Pubkey
+
+from rpc_client import close_clients, get_client, make_provider, send_with_blockhash_retry
 SYS_PROGRAM_ID = Pubkey.from_string("11111111111111111111111111111111")
 
 PROGRAM_ID = Pubkey.from_string("Gc7u33eCs81jPcfzgX4nh6xsiEtRYuZUyHKFjmf5asfx")
@@ -32,6 +33,8 @@ RARITY_VARIANTS = {
     "MegaHyperRare": "mega_hyper_rare",
     "Energy": "energy",
 }
+# Anchor enum args ({variant: {}}) built once; shared objects, callers must not mutate them.
+_RARITY_VARIANT = MappingProxyType({name: {key: {}} for name, key in RARITY_VARIANTS.items()})
 
 
 def load_keypair(path: Path) -> Keypair:
@@ -39,13 +42,6 @@ def load_keypair(path: Path) -> Keypair:
     return Keypair.from_bytes(bytes(data))
 
 
-def rarity_variant(name: str) -> dict:
-    key = RARITY_VARIANTS.get(name)
-    if not key:
-        raise ValueError(f"Unsupported rarity {name}")
-    return {key: {}}
-
-
 def vault_state_pda() -> Pubkey:
     return Pubkey.find_program_address([b"vault_state"], PROGRAM_ID)[0]
 
@@ -68,17 +64,21 @@ def load_idl() -> Idl:
 async def main() -> None:
     kp = load_keypair(KEYPAIR_PATH)
     wallet = Wallet(kp)
-    client = AsyncClient(RPC_URL, commitment=Confirmed)
-    provider = Provider(client, wallet)
+    client = get_client(RPC_URL)
+    provider = make_provider(client, wallet)
     idl = load_idl()
     program = Program(idl, PROGRAM_ID, provider)
 
     vault_state = vault_state_pda()
     vault_authority = vault_authority_pda(vault_state)
 
+    # derive every CardRecord PDA up front instead of inside the deposit loop
+    targets = []
     for asset_str, template_id, rarity in MISSING:
         asset = Pubkey.from_string(asset_str)
-        card_record = card_record_pda(vault_state, asset)
+        targets.append((asset_str, template_id, rarity, asset, card_record_pda(vault_state, asset)))
+
+    for asset_str, template_id, rarity, asset, card_record in targets:
         info = await client.get_account_info(card_record)
         if info.value is not None:
             print(f"CardRecord already exists for {asset_str}, skipping")
@@ -92,10 +92,13 @@ async def main() -> None:
             "vault_authority": vault_authority,
             "system_program": SYS_PROGRAM_ID,
         }
-        sig = await program.rpc["deposit_card"](template_id, rarity_variant(rarity), ctx=Context(accounts=accounts))
+        ctx = Context(accounts=accounts)
+        sig = await send_with_blockhash_retry(
+            client, lambda: program.rpc["deposit_card"](template_id, _RARITY_VARIANT[rarity], ctx=ctx)
+        )
         print(f" -> tx {sig}")
 
-    await client.close()
+    await close_clients()
 
 
 if __name__ == "__main__":
@@ -9,6 +9,9 @@ Outputs:
 - static/img/{set_slug}/{template_id}.jpg
 - static/nft/metadata/{set_slug}/{template_id}.json
 
+Build state (which source and options produced each image, so unchanged images are skipped) is
+kept in .static_assets_cache/{set_slug}.json, outside the published tree.
+
 Usage:
   python3 scripts/generate_static_assets.py \\
     --set-code meg_web \\
@@ -21,22 +24,50 @@ from __future__ import annotations
 
 import argparse
 import csv
+import io
 import json
+import os
 import re
+import shutil
 import sys
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 
 try:
     from PIL import Image
 except Exception:  # noqa: BLE001
     Image = None  # type: ignore[assignment]
 
+# Optional: orjson serializes metadata straight to bytes, byte-identical to the json fallback below.
+try:
+    import orjson
+
+    def dump_json(data: dict) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_APPEND_NEWLINE)
+
+except Exception:  # noqa: BLE001
+
+    def dump_json(data: dict) -> bytes:
+        return (json.dumps(data, ensure_ascii=False, indent=2) + "\n").encode("utf-8")
+
+
+# Optional: libjpeg-turbo via PyTurboJPEG encodes ~2-4x faster than Pillow's default libjpeg.
+try:
+    import numpy as np
+    from turbojpeg import TJPF_RGB, TurboJPEG
+
+    _TURBOJPEG = TurboJPEG()
+except Exception:  # noqa: BLE001
+    _TURBOJPEG = None
+
 
 ROOT_DIR = Path(__file__).resolve().parents[1]
 DEFAULT_ASSET_HOST = "https://getmochi.fun"
 DEFAULT_PLACEHOLDER = ROOT_DIR / "frontend" / "public" / "card_back.png"
+# Per-set record of which source and render options produced each JPEG; never written under static/.
+RENDER_MANIFEST_DIR = Path(os.environ.get("STATIC_ASSETS_CACHE", ROOT_DIR / ".static_assets_cache"))
 
 # Legacy Mega energies live outside the CSV; map their template_ids to filenames.
 MEGA_ENERGY_IMAGES: Dict[int, str] = {
@@ -75,17 +106,30 @@ def safe_template_str(template_id: int) -> str:
     return str(template_id).zfill(3)
 
 
+class _LowerAsciiOnly(dict):
+    """str.translate table keeping a-z and deleting everything else (filled lazily)."""
+
+    def __missing__(self, code: int):
+        value = code if 97 <= code <= 122 else None
+        self[code] = value
+        return value
+
+
+_RARITY_KEEP = _LowerAsciiOnly()
+_FLAG_SPLIT = re.compile(r"[+,/]")
+_RARITY_MAP = {
+    "doublerare": "double_rare",
+    "ultrarare": "ultra_rare",
+    "illustrationrare": "illustration_rare",
+    "specialillustrationrare": "special_illustration_rare",
+    "megahyperrare": "hyper_rare",
+    "hyperrare": "hyper_rare",
+}
+
+
 def normalize_rarity(value: str) -> str:
-    base = re.sub(r"[^a-z]", "", value.lower())
-    mapping = {
-        "doublerare": "double_rare",
-        "ultrarare": "ultra_rare",
-        "illustrationrare": "illustration_rare",
-        "specialillustrationrare": "special_illustration_rare",
-        "megahyperrare": "hyper_rare",
-        "hyperrare": "hyper_rare",
-    }
-    return mapping.get(base, base or "common")
+    base = value.lower().translate(_RARITY_KEEP)
+    return _RARITY_MAP.get(base, base or "common")
 
 
 def normalize_finish(raw: str) -> str:
@@ -108,21 +152,32 @@ def normalize_finish(raw: str) -> str:
 def normalize_printing_flags(raw: Optional[str]) -> str:
     if not raw:
         return "-"
-    tokens = [t.strip().lower() for t in re.split(r"[+,/]", raw) if t.strip()]
+    tokens = [t.strip().lower() for t in _FLAG_SPLIT.split(raw) if t.strip()]
     if not tokens:
         return "-"
     tokens = sorted(set(tokens))
     return "+".join(tokens)
 
 
-def parse_template_row(row: dict, idx: int, args) -> TemplateRow:
-    token = (
-        row.get("template_id")
-        or row.get("token_id")
-        or row.get("Number")
-        or row.get("serial_number")
-        or row.get("card_number")
-    )
+CsvGetter = Callable[..., Optional[str]]
+
+
+def csv_getter(header: List[str]) -> CsvGetter:
+    """Build get(row, *keys) over csv.reader rows: first non-empty value among `keys`, else None."""
+    col = {name: i for i, name in enumerate(header)}
+
+    def get(row: List[str], *keys: str) -> Optional[str]:
+        for key in keys:
+            i = col.get(key)
+            if i is not None and i < len(row) and row[i]:
+                return row[i]
+        return None
+
+    return get
+
+
+def parse_template_row(row: List[str], get: CsvGetter, idx: int, args) -> TemplateRow:
+    token = get(row, "template_id", "token_id", "Number", "serial_number", "card_number")
     base_id = idx + 1
     if token:
         try:
@@ -131,20 +186,14 @@ def parse_template_row(row: dict, idx: int, args) -> TemplateRow:
         except Exception:
             base_id = idx + 1
     template_id = args.offset + base_id
-    collector_number = (
-        row.get("serial_number")
-        or row.get("card_number")
-        or row.get("token_id")
-        or row.get("Number")
-        or safe_template_str(base_id)
-    )
-    name = (row.get("card_name") or row.get("name") or row.get("Name") or f"Card {template_id}").strip()
-    rarity = normalize_rarity(row.get("rarity") or row.get("Rarity") or "common")
-    finish_raw = row.get("variant") or row.get("Variant") or row.get("holo_type") or ""
+    collector_number = get(row, "serial_number", "card_number", "token_id", "Number") or safe_template_str(base_id)
+    name = (get(row, "card_name", "name", "Name") or f"Card {template_id}").strip()
+    rarity = normalize_rarity(get(row, "rarity", "Rarity") or "common")
+    finish_raw = get(row, "variant", "Variant", "holo_type") or ""
     finish = normalize_finish(finish_raw)
-    printing_flags = normalize_printing_flags(row.get("printing_flags") or row.get("flags"))
-    language_tag = (row.get("language_tag") or args.language or "en").strip()
-    image_hint = row.get("image_url") or row.get("Image URL") or row.get("image") or row.get("Image")
+    printing_flags = normalize_printing_flags(get(row, "printing_flags", "flags"))
+    language_tag = (get(row, "language_tag") or args.language or "en").strip()
+    image_hint = get(row, "image_url", "Image URL", "image", "Image")
 
     return TemplateRow(
         template_id=template_id,
@@ -165,9 +214,11 @@ def collect_templates(args) -> Dict[int, TemplateRow]:
     rows: Dict[int, TemplateRow] = {}
     csv_path = ROOT_DIR / args.csv
     with csv_path.open(newline="", encoding="utf-8") as fh:
-        reader = csv.DictReader(fh)
-        for idx, raw in enumerate(reader):
-            tmpl = parse_template_row(raw, idx, args)
+        reader = csv.reader(fh)
+        get = csv_getter(next(reader, []))
+        # DictReader skipped blank lines; keep idx numbering identical.
+        for idx, raw in enumerate(row for row in reader if row):
+            tmpl = parse_template_row(raw, get, idx, args)
             # Keep the first occurrence if duplicates are present.
             if tmpl.template_id not in rows:
                 rows[tmpl.template_id] = tmpl
@@ -192,7 +243,40 @@ def collect_templates(args) -> Dict[int, TemplateRow]:
     return rows
 
 
-def find_source_image(tmpl: TemplateRow, image_dir: Path, placeholder: Path) -> Path:
+# "<prefix>[<sep>*].<ext>": the shapes find_source_image looks for, parsed once per file.
+_CARD_FILE_RE = re.compile(r"^(?P<prefix>[^._-]+)(?:(?P<sep>[-_]).*)?(?P<ext>\.(?:jpe?g|png))$")
+
+ImageIndex = Dict[str, List[Tuple[str, str, Path]]]
+
+
+def index_image_dir(image_dir: Path) -> ImageIndex:
+    """List image_dir once, bucketing card images by prefix as (sep, ext, path) entries."""
+    index: ImageIndex = {}
+    for entry in sorted(os.scandir(image_dir), key=lambda e: e.name):
+        match = _CARD_FILE_RE.match(entry.name)
+        if match is None or not entry.is_file():
+            continue
+        index.setdefault(match["prefix"], []).append((match["sep"] or "", match["ext"], Path(entry.path)))
+    return index
+
+
+def _first_match(index: ImageIndex, prefix: str, patterns: List[Tuple[str, str]]) -> Optional[Path]:
+    """Return the first file matching glob(f"{prefix}{ext}") (empty sep) or glob(f"{prefix}{sep}*{ext}"), in pattern order."""
+    bucket = index.get(prefix)
+    if not bucket:
+        return None
+    for pattern in patterns:
+        for sep, ext, candidate in bucket:
+            if (sep, ext) == pattern:
+                return candidate
+    return None
+
+
+_BASE_PATTERNS = [(sep, ext) for sep in ("", "-", "_") for ext in (".jpg", ".jpeg", ".png")]
+_FALLBACK_PATTERNS = [("", ".jpg"), ("", ".png"), ("_", ".png"), ("-", ".png")]
+
+
+def find_source_image(tmpl: TemplateRow, image_dir: Path, index: ImageIndex, placeholder: Path) -> Path:
     # Energy files have custom names.
     if tmpl.template_id in MEGA_ENERGY_IMAGES:
         candidate = image_dir / MEGA_ENERGY_IMAGES[tmpl.template_id]
@@ -203,56 +287,68 @@ def find_source_image(tmpl: TemplateRow, image_dir: Path, placeholder: Path) ->
         candidate = image_dir / hint_name
         if candidate.exists():
             return candidate
-    padded = safe_template_str(tmpl.base_id)
     # Look for files by collector number prefix.
-    for pattern in [
-        f"{padded}.jpg",
-        f"{padded}.jpeg",
-        f"{padded}.png",
-        f"{padded}-*.jpg",
-        f"{padded}-*.jpeg",
-        f"{padded}-*.png",
-        f"{padded}_*.jpg",
-        f"{padded}_*.jpeg",
-        f"{padded}_*.png",
-    ]:
-        for candidate in image_dir.glob(pattern):
-            return candidate
+    candidate = _first_match(index, safe_template_str(tmpl.base_id), _BASE_PATTERNS)
+    if candidate:
+        return candidate
     # Fallback: any file that starts with the template id.
-    template_str = safe_template_str(tmpl.template_id)
-    for pattern in [f"{template_str}.jpg", f"{template_str}.png", f"{template_str}_*.png", f"{template_str}-*.png"]:
-        for candidate in image_dir.glob(pattern):
-            return candidate
+    candidate = _first_match(index, safe_template_str(tmpl.template_id), _FALLBACK_PATTERNS)
+    if candidate:
+        return candidate
     return placeholder
 
 
-def convert_to_jpeg(src: Path, dest: Path):
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    if src.suffix.lower() in {".jpg", ".jpeg"}:
-        dest.write_bytes(src.read_bytes())
+def convert_to_jpeg(src: Path, dest: Path, max_dim: Optional[int] = None, always_reencode: bool = False):
+    """Write src to dest as JPEG; dest's directory must already exist (process() creates it).
+
+    Re-encoded images are downscaled to fit within max_dim x max_dim. JPEG sources are
+    linked/copied as-is unless always_reencode is set.
+    """
+    # dest may be a hardlink to source art from an earlier run; unlink it so no write lands in the source tree.
+    dest.unlink(missing_ok=True)
+    if not always_reencode and src.suffix.lower() in {".jpg", ".jpeg"}:
+        # Already JPEG: hardlink (no data copy); copy_file_range/sendfile copy across filesystems.
+        try:
+            os.link(src, dest)
+        except OSError:
+            shutil.copyfile(src, dest)
         return
-    img = Image.open(src)
-    if img.mode in ("RGBA", "LA"):
-        background = Image.new("RGB", img.size, (255, 255, 255))
-        background.paste(img, mask=img.split()[-1])
-        img = background
-    else:
-        img = img.convert("RGB")
-    img.save(dest, format="JPEG", quality=95)
+    # Decode eagerly and close the source before encoding so a worker holds one file handle/raster at a time.
+    with Image.open(src) as src_img:
+        src_img.load()
+        if src_img.mode in ("RGBA", "LA"):
+            img = Image.new("RGB", src_img.size, (255, 255, 255))
+            img.paste(src_img, mask=src_img.split()[-1])
+        else:
+            img = src_img.convert("RGB")
+    if max_dim and max(img.size) > max_dim:
+        img.thumbnail((max_dim, max_dim), Image.LANCZOS)
+    if _TURBOJPEG is not None:
+        dest.write_bytes(_TURBOJPEG.encode(np.asarray(img), quality=95, pixel_format=TJPF_RGB))
+        return
+    # Encode in memory and hand the OS a single write instead of Pillow's chunked file writes.
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=95, optimize=True, progressive=True)
+    dest.write_bytes(buf.getbuffer())
+
+
+# Metadata trait order; values come from build_metadata in the same order.
+_ATTR_KEYS = ("template_id", "set_code", "collector_number", "rarity_norm", "finish", "printing_flags", "language_tag")
 
 
 def build_metadata(tmpl: TemplateRow, image_url: str) -> dict:
     name = f"{tmpl.name} #{safe_template_str(tmpl.template_id)}"
     description = f"{tmpl.set_code} template {tmpl.collector_number}".strip()
-    attrs = [
-        {"trait_type": "template_id", "value": tmpl.template_id},
-        {"trait_type": "set_code", "value": tmpl.set_code},
-        {"trait_type": "collector_number", "value": tmpl.collector_number},
-        {"trait_type": "rarity_norm", "value": tmpl.rarity},
-        {"trait_type": "finish", "value": tmpl.finish},
-        {"trait_type": "printing_flags", "value": tmpl.printing_flags or "-"},
-        {"trait_type": "language_tag", "value": tmpl.language_tag},
-    ]
+    values = (
+        tmpl.template_id,
+        tmpl.set_code,
+        tmpl.collector_number,
+        tmpl.rarity,
+        tmpl.finish,
+        tmpl.printing_flags or "-",
+        tmpl.language_tag,
+    )
+    attrs = [{"trait_type": key, "value": value} for key, value in zip(_ATTR_KEYS, values)]
     return {
         "name": name,
         "description": description,
@@ -267,9 +363,89 @@ def build_metadata(tmpl: TemplateRow, image_url: str) -> dict:
     }
 
 
-def write_metadata_file(dest: Path, data: dict):
-    dest.parent.mkdir(parents=True, exist_ok=True)
-    dest.write_text(json.dumps(data, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+def write_metadata_file(dest: Path, data: dict, force: bool = True) -> bool:
+    """Write metadata JSON (dir must exist); unless `force`, leave the file alone when its bytes already match."""
+    payload = dump_json(data)
+    if not force:
+        try:
+            if dest.read_bytes() == payload:
+                return False
+        except OSError:
+            pass
+    dest.write_bytes(payload)
+    return True
+
+
+def repo_relative(path: Path) -> str:
+    path = path.resolve()
+    try:
+        return path.relative_to(ROOT_DIR).as_posix()
+    except ValueError:
+        return str(path)
+
+
+def render_key(src: Path, max_dim: Optional[int], always_reencode: bool) -> Optional[list]:
+    """Identify what an image was rendered from: source path, mtime and size, plus the render options."""
+    try:
+        st = src.stat()
+    except OSError:
+        return None
+    return [repo_relative(src), st.st_mtime_ns, st.st_size, max_dim or 0, always_reencode]
+
+
+def load_render_manifest(path: Path) -> Dict[str, dict]:
+    try:
+        data = json.loads(path.read_bytes())
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def save_render_manifest(path: Path, manifest: Dict[str, dict]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    tmp.write_bytes(dump_json(manifest))
+    os.replace(tmp, path)
+
+
+def image_is_current(entry: Optional[dict], key: Optional[list], dest: Path) -> bool:
+    """True when dest is the file last rendered from exactly this source with these options.
+
+    Comparing the recorded source (not just mtimes) catches art swapped in with an older mtime
+    (rsync -a, cp -p, unzip) and changes to --max-dim / --always-reencode.
+    """
+    if not entry or key is None:
+        return False
+    try:
+        dest_mtime = dest.stat().st_mtime_ns
+    except OSError:
+        return False
+    return entry.get("src") == key and entry.get("dest_mtime_ns") == dest_mtime
+
+
+class RenderJob(NamedTuple):
+    tmpl: TemplateRow
+    src_image: Path
+    img_out: Path
+    meta_out: Path
+    image_url: str
+    force: bool
+    image_current: bool
+    max_dim: Optional[int]
+    always_reencode: bool
+
+
+def render_template(job: RenderJob) -> Tuple[bool, bool]:
+    """Worker: write one template's JPEG and metadata JSON (module-level so it pickles).
+
+    Returns (image_written, metadata_written); images already rendered from the same source and
+    options, and metadata with identical bytes, are skipped unless forced.
+    """
+    image_written = job.force or not job.image_current
+    if image_written:
+        convert_to_jpeg(job.src_image, job.img_out, job.max_dim, job.always_reencode)
+    metadata_written = write_metadata_file(job.meta_out, build_metadata(job.tmpl, job.image_url), force=job.force)
+    return image_written, metadata_written
 
 
 def process(args):
@@ -284,33 +460,61 @@ def process(args):
     if not placeholder.exists():
         raise SystemExit(f"Placeholder image not found: {placeholder}")
 
-    image_count = 0
-    metadata_count = 0
+    image_index = index_image_dir(image_dir)
     missing_images: List[int] = []
-
+    # Every template in a run shares args.set_slug, so the output dirs are resolved and created once here.
+    img_root = ROOT_DIR / args.static_root / "img" / args.set_slug
+    meta_root = ROOT_DIR / args.static_root / "nft" / "metadata" / args.set_slug
+    img_root.mkdir(parents=True, exist_ok=True)
+    meta_root.mkdir(parents=True, exist_ok=True)
+    image_base_url = f"{args.asset_base_url.rstrip('/')}/img/{args.set_slug}"
+    manifest_path = RENDER_MANIFEST_DIR / f"{args.set_slug}.json"
+    manifest = load_render_manifest(manifest_path)
+    render_keys: List[Optional[list]] = []
+
+    jobs: List[RenderJob] = []
     for tmpl_id in sorted(templates.keys()):
         tmpl = templates[tmpl_id]
-        src_image = find_source_image(tmpl, image_dir, placeholder)
+        src_image = find_source_image(tmpl, image_dir, image_index, placeholder)
         if not src_image.exists():
             missing_images.append(tmpl.template_id)
             src_image = placeholder
-        img_out = ROOT_DIR / args.static_root / "img" / tmpl.set_slug / f"{safe_template_str(tmpl.template_id)}.jpg"
-        convert_to_jpeg(src_image, img_out)
-        image_count += 1
-
-        image_url = f"{args.asset_base_url.rstrip('/')}/img/{tmpl.set_slug}/{safe_template_str(tmpl.template_id)}.jpg"
-        meta_out = (
-            ROOT_DIR
-            / args.static_root
-            / "nft"
-            / "metadata"
-            / tmpl.set_slug
-            / f"{safe_template_str(tmpl.template_id)}.json"
+        tid_str = safe_template_str(tmpl.template_id)
+        img_out = img_root / f"{tid_str}.jpg"
+        key = render_key(src_image, args.max_dim, args.always_reencode)
+        render_keys.append(key)
+        jobs.append(
+            RenderJob(
+                tmpl,
+                src_image,
+                img_out,
+                meta_root / f"{tid_str}.json",
+                f"{image_base_url}/{tid_str}.jpg",
+                args.force,
+                image_is_current(manifest.get(repo_relative(img_out)), key, img_out),
+                args.max_dim,
+                args.always_reencode,
+            )
         )
-        write_metadata_file(meta_out, build_metadata(tmpl, image_url))
-        metadata_count += 1
 
-    print(f"Generated {image_count} images and {metadata_count} metadata files for set '{args.set_slug}'.")
+    # Image encoding is CPU-bound and independent per template, so fan it out across processes.
+    if args.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            results = list(pool.map(render_template, jobs, chunksize=16))
+    else:
+        results = [render_template(job) for job in jobs]
+    for job, key, (image_written, _) in zip(jobs, render_keys, results):
+        if image_written and key is not None:
+            manifest[repo_relative(job.img_out)] = {"src": key, "dest_mtime_ns": job.img_out.stat().st_mtime_ns}
+    save_render_manifest(manifest_path, manifest)
+    image_count = metadata_count = len(results)
+    images_written = sum(1 for image_written, _ in results if image_written)
+    metadata_written = sum(1 for _, meta_written in results if meta_written)
+
+    print(
+        f"Generated {image_count} images and {metadata_count} metadata files for set '{args.set_slug}' "
+        f"({images_written} images and {metadata_written} metadata files written, rest unchanged)."
+    )
     if missing_images:
         print(f"Warning: {len(missing_images)} templates used the placeholder image: {sorted(missing_images)[:10]}{'...' if len(missing_images) > 10 else ''}")
 
@@ -326,6 +530,10 @@ def parse_args(argv: Optional[List[str]] = None):
     parser.add_argument("--language", default="en", help="Language tag to stamp into metadata when missing")
     parser.add_argument("--asset-base-url", default=DEFAULT_ASSET_HOST, dest="asset_base_url", help="Public base URL for assets (default: https://getmochi.fun)")
     parser.add_argument("--placeholder", default=str(DEFAULT_PLACEHOLDER), help="Path to placeholder image for missing art")
+    parser.add_argument("--max-dim", type=int, default=1024, dest="max_dim", help="Downscale re-encoded art to fit within NxN pixels (0 disables)")
+    parser.add_argument("--always-reencode", action="store_true", dest="always_reencode", help="Re-encode JPEG sources too (applies --max-dim) instead of linking them")
+    parser.add_argument("--force", action="store_true", help="Rewrite every output even if it looks up to date")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Parallel image workers (default: CPU count; 1 disables)")
     return parser.parse_args(argv)
 
 
@@ -3,63 +3,165 @@ Usage: python import_card_templates.py path/to/cards.csv
 Reads the provided CSV and inserts into backend DB.
 """
 import csv
+import itertools
 import sys
 import time
 from pathlib import Path
+from typing import Iterator, Sequence
 
-from sqlmodel import Session, SQLModel, create_engine
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, SQLModel, create_engine, select
 
 sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
 from main import CardTemplate, auth_settings  # type: ignore
 
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except Exception:  # noqa: BLE001
+    pa = pacsv = None
+
+BATCH_SIZE = 1000
+_BOOL_TRUE = frozenset({"true", "1", "yes"})
+UPSERT_DIALECTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+
+
+def bulk_write_templates(conn, batch: list) -> None:
+    """Fallback for dialects without ON CONFLICT: split the batch into new vs existing ids
+    and write each side with the ORM bulk mappings (no unit-of-work / identity-map overhead)."""
+    table = CardTemplate.__table__
+    ids = [row["template_id"] for row in batch]
+    existing = {tid for (tid,) in conn.execute(select(table.c.template_id).where(table.c.template_id.in_(ids)))}
+    to_insert = [row for row in batch if row["template_id"] not in existing]
+    to_update = [row for row in batch if row["template_id"] in existing]
+    session = Session(bind=conn)
+    try:
+        if to_insert:
+            session.bulk_insert_mappings(CardTemplate, to_insert)
+        if to_update:
+            session.bulk_update_mappings(CardTemplate, to_update)
+        session.flush()
+    finally:
+        session.close()
+
+
+def upsert_templates(conn, batch: list) -> None:
+    """INSERT ... ON CONFLICT (template_id) DO UPDATE for one batch of CSV rows.
+
+    Only the CSV-sourced columns are updated, so cached price fields survive a re-import.
+    """
+    insert_fn = UPSERT_DIALECTS.get(conn.dialect.name)
+    if insert_fn is None:
+        bulk_write_templates(conn, batch)
+        return
+    stmt = insert_fn(CardTemplate.__table__).values(batch)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["template_id"],
+        set_={key: stmt.excluded[key] for key in batch[0] if key != "template_id"},
+    )
+    conn.execute(stmt)
+
+
+def read_csv_rows(csv_path: str) -> Iterator[Sequence[str]]:
+    """Yield the header row, then each data row, as sequences of strings.
+
+    With pyarrow installed the file is streamed batch by batch through its multithreaded C++
+    reader; otherwise rows stream from csv.reader. The header is read as an ordinary row so every
+    column is inferred as string (values such as "001" or "true" keep their text), and quoted
+    multi-line fields are accepted just as csv.reader accepts them. If pyarrow rejects a block
+    (e.g. a ragged row), csv.reader takes over from the first row not yet yielded, so malformed
+    files are handled the same with or without pyarrow.
+    """
+    done = 0
+    if pacsv is not None:
+        try:
+            reader = pacsv.open_csv(
+                csv_path,
+                read_options=pacsv.ReadOptions(autogenerate_column_names=True),
+                parse_options=pacsv.ParseOptions(newlines_in_values=True),
+                convert_options=pacsv.ConvertOptions(null_values=[], strings_can_be_null=False),
+            )
+        except pa.ArrowInvalid:  # e.g. an empty file, or a ragged row in the first block
+            reader = None
+        # a numeric-looking header could let a column infer as non-string; use csv.reader then
+        if reader is not None and all(pa.types.is_string(field.type) for field in reader.schema):
+            batches = iter(reader)
+            while True:
+                try:
+                    batch = next(batches)
+                except StopIteration:
+                    return
+                except pa.ArrowInvalid:
+                    break
+                yield from zip(*(column.to_pylist() for column in batch.columns))
+                done += batch.num_rows
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        yield from itertools.islice(csv.reader(f), done, None)
+
 
 def main(csv_path: str):
     engine = create_engine(auth_settings.database_url)
     SQLModel.metadata.create_all(engine)
-    rows = []
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    imported = 0
+    # keyed by template_id: a repeated id in the CSV keeps its last row, and a single
+    # ON CONFLICT statement may not touch the same row twice
+    pending = {}
+    with engine.begin() as conn:
+        reader = read_csv_rows(csv_path)
+        col = {name: i for i, name in enumerate(next(reader, []))}
+
+        def columns(*keys):
+            # fallback chains resolved once against the header: only columns that exist, in order
+            return tuple(col[key] for key in keys if key in col)
+
+        def first(row, cols):
+            for i in cols:
+                if i < len(row) and row[i]:
+                    return row[i]
+            return None
+
+        def cell(row, i):
+            return row[i] if i is not None and i < len(row) else None
+
+        tid_cols = columns("template_id", "token_id", "Number")
+        index_cols = columns("index")
+        name_cols = columns("card_name", "name", "Name")
+        rarity_cols = columns("rarity", "Rarity")
+        image_cols = columns("image_url", "Image URL", "image", "Image")
+        serial_cols = columns("serial_number", "card_number", "cardNumber", "Number", "token_id", "tokenId")
+        variant_col = col.get("variant")
+        set_code_col = col.get("set_code")
+        set_name_col = col.get("set_name")
+        is_energy_col = col.get("is_energy")
+        energy_type_col = col.get("energy_type")
+
         for r in reader:
-            rows.append(r)
-    with Session(engine) as session:
-        for r in rows:
-            template_raw = r.get("template_id") or r.get("token_id") or r.get("Number")
+            template_raw = first(r, tid_cols)
             if not template_raw:
                 continue
             template_id = int(template_raw)
-            idx_raw = r.get("index") or template_id
-            name = r.get("card_name") or r.get("name") or r.get("Name") or ""
-            rarity = r.get("rarity") or r.get("Rarity") or "Common"
-            image_url = (
-                r.get("image_url")
-                or r.get("Image URL")
-                or r.get("image")
-                or r.get("Image")
-            )
-            serial_number = (
-                r.get("serial_number")
-                or r.get("card_number")
-                or r.get("cardNumber")
-                or r.get("Number")
-                or r.get("token_id")
-                or r.get("tokenId")
-            )
-            template = CardTemplate(
+            idx_raw = first(r, index_cols) or template_id
+            pending[template_id] = dict(
                 template_id=template_id,
                 index=int(idx_raw),
-                card_name=name,
-                rarity=rarity,
-                variant=r.get("variant"),
-                set_code=r.get("set_code"),
-                set_name=r.get("set_name"),
-                serial_number=serial_number,
-                is_energy=str(r.get("is_energy", "false")).lower() in ["true", "1", "yes"],
-                energy_type=r.get("energy_type"),
-                image_url=image_url,
+                card_name=first(r, name_cols) or "",
+                rarity=first(r, rarity_cols) or "Common",
+                variant=cell(r, variant_col),
+                set_code=cell(r, set_code_col),
+                set_name=cell(r, set_name_col),
+                serial_number=first(r, serial_cols),
+                is_energy=(cell(r, is_energy_col) or "false").lower() in _BOOL_TRUE,
+                energy_type=cell(r, energy_type_col),
+                image_url=first(r, image_cols),
             )
-            session.merge(template)
-        session.commit()
-    print(f"Imported {len(rows)} templates @ {time.time()}")
+            imported += 1
+            if len(pending) >= BATCH_SIZE:
+                upsert_templates(conn, list(pending.values()))
+                pending.clear()
+        if pending:
+            upsert_templates(conn, list(pending.values()))
+    print(f"Imported {imported} templates @ {time.time()}")
 
 
 if __name__ == "__main__":
@@ -8,7 +8,8 @@ Map existing CardTemplate rows to PokemonPriceTracker tcgPlayerId values using s
 - Skips mappings that don't match rarity or would obviously be wrong (e.g., Common mapped to a $40 card).
 
 This script is idempotent: it will skip rows that already have tcgplayer_id unless --force is provided.
-Respectful rate limiting is applied between lookups.
+Searches run concurrently (--concurrency) behind a shared rate limiter that honours --sleep and the API's
+Retry-After / X-RateLimit-Remaining headers.
 
 DEPRECATED (do not run by default):
 - Canonical flow is `backend/tasks/bootstrap_prices.py` + `backend/smart_price_scheduler.py` (see `PRICE_ORACLE_RUNBOOK.md`).
@@ -19,13 +20,21 @@ import argparse
 import json
 import os
 import re
+import sqlite3
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from urllib.parse import quote
 
 import requests
+from requests.adapters import HTTPAdapter
+from sqlalchemy.orm.attributes import set_committed_value
 from sqlmodel import Session, select
+from urllib3.util.retry import Retry
 
 ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 if ROOT not in sys.path:
@@ -33,6 +42,18 @@ if ROOT not in sys.path:
 
 from backend.main import PACK_REGISTRY, CardPriceMapping, CardTemplate, engine, init_db  # noqa: E402
 
+# Optional: orjson parses the multi-MB offline export natively; json.loads accepts the same bytes.
+try:
+    import orjson
+
+    load_json_bytes = orjson.loads
+    dump_json_bytes = orjson.dumps
+except Exception:  # noqa: BLE001
+    load_json_bytes = json.loads
+
+    def dump_json_bytes(data) -> bytes:
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
 
 _allow_legacy = str(os.environ.get("ALLOW_LEGACY_PPT_SCRIPTS", "") or "").strip().lower() in {"1", "true", "yes", "y"}
 if not _allow_legacy:
@@ -49,6 +70,15 @@ API_KEY = (
 )
 
 RARITY_CAP_COMMON = 10.0
+OFFLINE_EXPORT = Path(ROOT) / "price_oracle" / "ppt_mega_sets.json"
+OFFLINE_SHARD_DIR = OFFLINE_EXPORT.parent / "ppt_sets"
+RESPONSE_CACHE_PATH = Path(os.environ.get("MAP_PRICES_CACHE", os.path.join(ROOT, ".map_prices_cache.sqlite")))
+RESPONSE_CACHE_TTL = 86400
+RATE_LIMIT_RETRIES = 3
+RATE_LIMIT_WAIT = 5.0
+# PokemonPriceTracker answers 403 as well as 429 when the credit budget is exhausted.
+RATE_LIMIT_STATUSES = (429, 403)
+COMMIT_BATCH_SIZE = 50
 RARITY_NORMALIZATION = {
     "double rare": "doublerare",
     "double_rare": "doublerare",
@@ -69,27 +99,55 @@ VARIANT_NORMALIZATION = {
     "non holo": "normal",
     "normal": "normal",
 }
+RARITY_FILTER_LABELS = {
+    "doublerare": "Double Rare",
+    "illustrationrare": "Illustration Rare",
+    "specialillustrationrare": "Special Illustration Rare",
+    "megahyperrare": "Hyper Rare",
+}
+_WS_RE = re.compile(r"\s+")
+_NONALNUM_RE = re.compile(r"[^0-9a-zA-Z]+")
+_CAMEL_RE = re.compile(r"(?<!^)(?=[A-Z])")
+_SEARCH_CLEAN_RE = re.compile(r"[^0-9A-Za-z :'/\\-]+")
+# Separators dropped when comparing rarity / variant labels ("Double Rare" == "double_rare").
+_STRIP_TABLE = str.maketrans("", "", " _-")
+_SETNAME_TRANS = str.maketrans("_", " ")
+
+
+@lru_cache(maxsize=4096)
+def _normalize_text(raw: str) -> str:
+    return " ".join(raw.split()).lower()
 
 
 def normalize_text(value: Optional[str]) -> str:
-    return re.sub(r"\s+", " ", str(value or "")).strip().lower()
+    return _normalize_text(str(value or ""))
+
+
+@lru_cache(maxsize=4096)
+def _normalize_set_name(raw: str) -> str:
+    idx = raw.find(":")
+    if idx >= 0:
+        raw = raw[idx + 1 :]
+    return " ".join(raw.translate(_SETNAME_TRANS).split()).lower()
 
 
 def normalize_set_name(value: Optional[str]) -> str:
     if not value:
         return ""
-    raw = str(value)
-    if ":" in raw:
-        raw = raw.split(":", 1)[1]
-    raw = raw.replace("_", " ")
-    return normalize_text(raw)
+    return _normalize_set_name(str(value))
 
 
-def normalized_rarity(value: Optional[str]) -> str:
-    base = normalize_text(value).replace(" ", "").replace("_", "").replace("-", "")
+@lru_cache(maxsize=256)
+def _normalized_rarity(raw: str) -> str:
+    base = _normalize_text(raw).translate(_STRIP_TABLE)
     return RARITY_NORMALIZATION.get(base, base)
 
 
+def normalized_rarity(value: Optional[str]) -> str:
+    return _normalized_rarity(str(value or ""))
+
+
+@lru_cache(maxsize=256)
 def rarity_filter_value(value: Optional[str]) -> Optional[str]:
     """
     Convert internal rarity labels into API-friendly query strings.
@@ -97,24 +155,18 @@ def rarity_filter_value(value: Optional[str]) -> Optional[str]:
     if not value:
         return None
     norm = normalized_rarity(value)
-    pretty_map = {
-        "doublerare": "Double Rare",
-        "illustrationrare": "Illustration Rare",
-        "specialillustrationrare": "Special Illustration Rare",
-        "megahyperrare": "Hyper Rare",
-    }
-    if norm in pretty_map:
-        return pretty_map[norm]
+    if norm in RARITY_FILTER_LABELS:
+        return RARITY_FILTER_LABELS[norm]
     raw = str(value)
-    spaced = re.sub(r"(?<!^)(?=[A-Z])", " ", raw).replace("_", " ")
-    spaced = re.sub(r"\s+", " ", spaced).strip()
+    spaced = _CAMEL_RE.sub(" ", raw).replace("_", " ")
+    spaced = _WS_RE.sub(" ", spaced).strip()
     return spaced or None
 
 
 def normalized_variant(value: Optional[str]) -> Optional[str]:
     if value is None:
         return None
-    base = normalize_text(value).replace(" ", "").replace("_", "").replace("-", "")
+    base = normalize_text(value).translate(_STRIP_TABLE)
     return VARIANT_NORMALIZATION.get(base, base)
 
 
@@ -127,16 +179,17 @@ def serial_candidates(value: Optional[str]) -> List[str]:
     if "/" in raw:
         parts.append(raw.split("/")[0])
     for p in parts:
-        norm = re.sub(r"[^0-9a-zA-Z]+", "", p).lower()
+        norm = _NONALNUM_RE.sub("", p).lower()
         if norm:
             vals.append(norm)
     return vals
 
 
-def derive_base_id(tmpl: CardTemplate) -> Optional[int]:
-    if not getattr(tmpl, "set_code", None):
+@lru_cache(maxsize=4096)
+def derive_base_id(set_code: Optional[str], template_id: Optional[int]) -> Optional[int]:
+    if not set_code:
         return None
-    cfg = PACK_REGISTRY.get(tmpl.set_code)
+    cfg = PACK_REGISTRY.get(set_code)
     if not cfg:
         return None
     try:
@@ -144,7 +197,7 @@ def derive_base_id(tmpl: CardTemplate) -> Optional[int]:
     except Exception:
         offset = 0
     try:
-        base_id = int(tmpl.template_id) - offset
+        base_id = int(template_id) - offset
         if base_id > 0:
             return base_id
     except Exception:
@@ -206,7 +259,7 @@ def collection_label(tmpl: CardTemplate) -> str:
 def primary_serial_token(tmpl: CardTemplate) -> Optional[str]:
     if getattr(tmpl, "serial_number", None):
         return str(tmpl.serial_number)
-    base_id = derive_base_id(tmpl)
+    base_id = derive_base_id(getattr(tmpl, "set_code", None), tmpl.template_id)
     if base_id:
         return str(base_id)
     return None
@@ -224,150 +277,328 @@ def cleaned_search_term(tmpl: CardTemplate) -> str:
         return ""
     parts = [collection, serial, name]
     term = " ".join([p for p in parts if p]).strip()
-    term = re.sub(r"[^0-9A-Za-z :'/\\-]+", " ", term)
-    return re.sub(r"\s+", " ", term).strip()
+    term = _SEARCH_CLEAN_RE.sub(" ", term)
+    return _WS_RE.sub(" ", term).strip()
+
+
+def _collect_prices(source: dict, keys: Tuple[str, ...], out: List[float]) -> None:
+    for key in keys:
+        try:
+            val = source.get(key)
+            if val is not None:
+                out.append(float(val))
+        except Exception:
+            continue
 
 
 def extract_market_price(card: dict, variant: Optional[str] = None) -> float:
-    target_variant = normalized_variant(variant)
+    """
+    Highest price found on the card: top-level prices, every variant's market/mid/price and,
+    for the first variant matching `variant`, its per-condition prices.
+    """
     prices = card.get("prices") or {}
+    if not isinstance(prices, dict):
+        return 0.0
+    target_variant = normalized_variant(variant)
     candidates: List[float] = []
-    if isinstance(prices, dict) and target_variant:
-        variants = prices.get("variants") or {}
-        if isinstance(variants, dict):
-            for key, var in variants.items():
-                if not isinstance(var, dict):
-                    continue
-                key_norm = normalized_variant(key)
-                if key_norm and key_norm == target_variant:
-                    for price_key in ("market", "mid", "price"):
-                        try:
-                            val = var.get(price_key)
-                            if val is not None:
-                                candidates.append(float(val))
-                        except Exception:
-                            continue
-                    conditions = var.get("conditions") if isinstance(var, dict) else {}
-                    if isinstance(conditions, dict):
-                        for cond in conditions.values():
-                            if not isinstance(cond, dict):
-                                continue
-                            for price_key in ("price", "market"):
-                                try:
-                                    val = cond.get(price_key)
-                                    if val is not None:
-                                        candidates.append(float(val))
-                                except Exception:
-                                    continue
-                    break
-    if isinstance(prices, dict):
-        for key in ("market", "marketPrice", "direct_low", "directLow", "mid"):
-            try:
-                val = prices.get(key)
-                if val is not None:
-                    candidates.append(float(val))
-            except Exception:
+    _collect_prices(prices, ("market", "marketPrice", "direct_low", "directLow", "mid"), candidates)
+    variants = prices.get("variants") or {}
+    if isinstance(variants, dict):
+        for key, var in variants.items():
+            if not isinstance(var, dict):
                 continue
-        variants = prices.get("variants") or {}
-        if isinstance(variants, dict):
-            for var in variants.values():
-                if not isinstance(var, dict):
-                    continue
-                for key in ("market", "mid", "price"):
-                    try:
-                        val = var.get(key)
-                        if val is not None:
-                            candidates.append(float(val))
-                    except Exception:
-                        continue
+            _collect_prices(var, ("market", "mid", "price"), candidates)
+            if target_variant and normalized_variant(key) == target_variant:
+                conditions = var.get("conditions")
+                if isinstance(conditions, dict):
+                    for cond in conditions.values():
+                        if isinstance(cond, dict):
+                            _collect_prices(cond, ("price", "market"), candidates)
+                target_variant = None
     return max(candidates) if candidates else 0.0
 
 
-def fetch_candidates(query: str, rarity_filter: Optional[str] = None, offline_cards: Optional[List[dict]] = None) -> List[dict]:
+class RateLimiter:
+    """
+    Spaces API calls at least `interval` seconds apart across worker threads and pauses
+    everyone when the API reports the budget is exhausted (429/403, X-RateLimit-Remaining: 0).
+    """
+
+    def __init__(self, interval: float):
+        self.interval = max(0.0, interval)
+        self._lock = threading.Lock()
+        self._next_at = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_at)
+            self._next_at = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+    def _pause(self, seconds: float) -> None:
+        with self._lock:
+            self._next_at = max(self._next_at, time.monotonic() + seconds)
+
+    def observe(self, resp: requests.Response) -> None:
+        """Pause all workers when the API says the budget is spent (after urllib3 retries gave up)."""
+        try:
+            retry_after = float(resp.headers.get("Retry-After") or 0)
+        except ValueError:
+            retry_after = 0.0
+        if resp.status_code in RATE_LIMIT_STATUSES or resp.headers.get("X-RateLimit-Remaining") == "0":
+            self._pause(retry_after or RATE_LIMIT_WAIT)
+
+
+def build_api_session() -> requests.Session:
+    """
+    Keep-alive session shared by all workers. Rate-limit and transient gateway errors are retried
+    by urllib3 with exponential backoff, honouring Retry-After.
+    """
+    session = requests.Session()
+    session.headers["Accept"] = "application/json"
+    if API_KEY:
+        session.headers["Authorization"] = f"Bearer {API_KEY}"
+    retry = Retry(
+        total=RATE_LIMIT_RETRIES,
+        backoff_factor=1.5,
+        status_forcelist=[*RATE_LIMIT_STATUSES, 502, 503, 504],
+        allowed_methods=["GET"],
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=10, pool_maxsize=32, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+_SESSION = build_api_session()
+
+
+class ResponseCache:
+    """
+    Search results keyed by (query, rarity filter), kept in a small SQLite file for `ttl` seconds so
+    re-runs (after failures, or with --force) only hit the API for new terms. With `read=False`
+    entries are refreshed but never served.
+    """
+
+    def __init__(self, path: Path, ttl: float = RESPONSE_CACHE_TTL, read: bool = True):
+        self.ttl = ttl
+        self.read = read
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, stored_at REAL, body BLOB)")
+        self._conn.commit()
+
+    @staticmethod
+    def key(query: str, rarity_filter: Optional[str]) -> str:
+        return f"{query}::{rarity_filter or ''}"
+
+    def get(self, query: str, rarity_filter: Optional[str]) -> Optional[List[dict]]:
+        if not self.read:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT stored_at, body FROM responses WHERE key = ?", (self.key(query, rarity_filter),)
+            ).fetchone()
+        if not row or time.time() - row[0] > self.ttl:
+            return None
+        return load_json_bytes(row[1])
+
+    def set(self, query: str, rarity_filter: Optional[str], cards: List[dict]) -> None:
+        body = dump_json_bytes(cards)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, stored_at, body) VALUES (?, ?, ?)",
+                (self.key(query, rarity_filter), time.time(), body),
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def fetch_candidates(
+    query: str,
+    rarity_filter: Optional[str] = None,
+    offline_cards: Optional[List[dict]] = None,
+    limiter: Optional[RateLimiter] = None,
+    cache: Optional[ResponseCache] = None,
+) -> List[dict]:
     if offline_cards is not None:
         return offline_cards
-    headers = {"Accept": "application/json"}
-    if API_KEY:
-        headers["Authorization"] = f"Bearer {API_KEY}"
+    if cache:
+        cached = cache.get(query, rarity_filter)
+        if cached is not None:
+            return cached
     params = {"search": query}
     if rarity_filter:
         params["rarity"] = rarity_filter
-    for attempt in range(2):
-        try:
-            resp = requests.get(f"{API_BASE}/cards", params=params, headers=headers, timeout=30)
-            if resp.status_code in (429, 403) and attempt == 0:
-                wait_for = 5.0
-                print(f"[warn] rate limited term='{query}' status={resp.status_code}, sleeping {wait_for}s")
-                time.sleep(wait_for)
-                continue
-            resp.raise_for_status()
-            data = resp.json()
-            break
-        except Exception as exc:  # noqa: BLE001
-            print(f"[error] search failed term='{query}': {exc}")
-            return []
+    try:
+        if limiter:
+            limiter.wait()
+        resp = _SESSION.get(f"{API_BASE}/cards", params=params, timeout=30)
+        if limiter:
+            limiter.observe(resp)
+        resp.raise_for_status()
+        data = resp.json()
+    except Exception as exc:  # noqa: BLE001
+        print(f"[error] search failed term='{query}': {exc}")
+        return []
     if isinstance(data, dict):
         cards = data.get("cards") or data.get("data") or []
     else:
         cards = data
     if isinstance(cards, dict):
         cards = cards.get("cards") or cards.get("data") or []
-    return cards if isinstance(cards, list) else []
+    cards = cards if isinstance(cards, list) else []
+    if cache:
+        cache.set(query, rarity_filter, cards)
+    return cards
 
 
-def choose_best_match(tmpl: CardTemplate, cards: List[dict]) -> Tuple[Optional[dict], List[dict]]:
-    if not cards:
-        return None, []
-    target_name = normalize_text(tmpl.card_name)
+SearchJob = Tuple[CardTemplate, str, Optional[str]]
+
+
+def search_all(
+    jobs: List[SearchJob],
+    offline_cards: Optional[List[dict]],
+    limiter: RateLimiter,
+    workers: int,
+    cache: Optional[ResponseCache] = None,
+) -> Iterator[Tuple[SearchJob, List[dict]]]:
+    """
+    Yield (job, candidates) in job order. Live searches run on a thread pool so the API
+    round trips overlap; the caller stays the only thread touching the DB session.
+    """
+    if offline_cards is not None or workers <= 1:
+        for job in jobs:
+            yield job, fetch_candidates(job[1], job[2], offline_cards, limiter, cache)
+        return
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        futures = [executor.submit(fetch_candidates, term, rarity_filter, None, limiter, cache) for _, term, rarity_filter in jobs]
+        for job, future in zip(jobs, futures):
+            yield job, future.result()
+    finally:
+        # Stopping early (--limit) drops the searches that have not started yet.
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def card_set_name(card: dict) -> Optional[str]:
+    set_field = card.get("setName") or card.get("set_name")
+    if not set_field:
+        set_obj = card.get("set")
+        if isinstance(set_obj, dict):
+            set_field = set_obj.get("name") or set_obj.get("code")
+        else:
+            set_field = set_obj
+    return set_field
+
+
+def card_serials(card: dict) -> List[str]:
+    return serial_candidates(
+        card.get("cardNumber")
+        or card.get("card_number")
+        or card.get("serial_number")
+        or card.get("number")
+        or card.get("card_number_raw")
+    )
+
+
+def match_targets(tmpl: CardTemplate) -> Tuple[str, List[str]]:
+    """Normalized set name and serial tokens a candidate card must line up with."""
     target_set = normalize_set_name(tmpl.set_name or tmpl.set_code)
-    target_rarity = normalized_rarity(tmpl.rarity)
     target_serials = serial_candidates(getattr(tmpl, "serial_number", None))
-    base_id = derive_base_id(tmpl)
+    base_id = derive_base_id(getattr(tmpl, "set_code", None), tmpl.template_id)
     if base_id:
         target_serials.append(f"{base_id:03d}")
         target_serials.append(str(base_id))
-    scored: List[Tuple[int, float, dict]] = []
+    return target_set, target_serials
+
+
+def prepare_candidate_rows(cards: List[dict]) -> List[dict]:
+    """
+    Normalize each candidate card once (name, set, rarity, serial tokens, market price) so that
+    choose_best_match only does equality and set-membership checks. The original card is kept
+    under "raw".
+    """
+    rows: List[dict] = []
     for card in cards:
-        name_norm = normalize_text(card.get("name"))
-        set_field = card.get("setName") or card.get("set_name")
-        if not set_field:
-            set_obj = card.get("set")
-            if isinstance(set_obj, dict):
-                set_field = set_obj.get("name") or set_obj.get("code")
-            else:
-                set_field = set_obj
-        set_norm = normalize_set_name(set_field)
-        rarity_field = card.get("rarityName") or card.get("rarity")
-        rarity_norm = normalized_rarity(rarity_field)
-        price = extract_market_price(card)
+        rows.append(
+            {
+                "name": normalize_text(card.get("name")),
+                "set": normalize_set_name(card_set_name(card)),
+                "rarity": normalized_rarity(card.get("rarityName") or card.get("rarity")),
+                "serials": frozenset(card_serials(card)),
+                "price": extract_market_price(card),
+                "raw": card,
+            }
+        )
+    return rows
+
+
+OfflineIndex = Dict[Tuple[str, str], List[int]]
+
+
+def build_offline_index(rows: List[dict]) -> OfflineIndex:
+    """
+    Index prepared offline rows by (normalized set, serial token) -> positions in `rows`.
+    Cards without a card number are filed under (set, "") since choose_best_match lets them through
+    on set alone.
+    """
+    index: OfflineIndex = {}
+    for pos, row in enumerate(rows):
+        for serial in row["serials"] or ("",):
+            index.setdefault((row["set"], serial), []).append(pos)
+    return index
+
+
+def offline_candidates(tmpl: CardTemplate, rows: List[dict], index: OfflineIndex) -> List[dict]:
+    """Subset of `rows` that can pass choose_best_match's set/serial checks, in original order."""
+    target_set, target_serials = match_targets(tmpl)
+    if not target_set or not target_serials:
+        return rows
+    positions = set(index.get((target_set, ""), ()))
+    for serial in target_serials:
+        positions.update(index.get((target_set, serial), ()))
+    return [rows[pos] for pos in sorted(positions)]
+
+
+def choose_best_match(tmpl: CardTemplate, rows: List[dict]) -> Tuple[Optional[dict], List[dict]]:
+    """Pick the best card among rows from prepare_candidate_rows; returns (card, other top-scoring cards)."""
+    if not rows:
+        return None, []
+    target_name = normalize_text(tmpl.card_name)
+    target_set, target_serials = match_targets(tmpl)
+    target_rarity = normalized_rarity(tmpl.rarity)
+    scored: List[Tuple[int, float, dict]] = []
+    for row in rows:
+        price = row["price"]
         # Hard guard: common cards should not map to obviously expensive entries.
         if target_rarity == "common" and price and price > RARITY_CAP_COMMON:
             continue
-        card_serials = serial_candidates(
-            card.get("cardNumber")
-            or card.get("card_number")
-            or card.get("serial_number")
-            or card.get("number")
-            or card.get("card_number_raw")
-        )
+        set_norm = row["set"]
+        serials = row["serials"]
         if target_set and set_norm != target_set:
             continue
-        if target_serials and card_serials and not any(s in card_serials for s in target_serials):
+        serial_match = bool(serials) and any(s in serials for s in target_serials)
+        if target_serials and serials and not serial_match:
             # Require serial alignment when we have one to avoid name-only matches.
             continue
-        score = 0
-        if target_set and set_norm and set_norm == target_set:
-            score += 4
-        if name_norm == target_name:
-            score += 2
-        if target_rarity and rarity_norm == target_rarity:
-            score += 4
-        else:
+        if not target_rarity or row["rarity"] != target_rarity:
             # Require rarity alignment; skip if it doesn't match
             continue
-        if target_serials and card_serials and any(s in card_serials for s in target_serials):
+        score = 4
+        if target_set and set_norm:
+            score += 4
+        if row["name"] == target_name:
+            score += 2
+        if serial_match:
             score += 6
-        scored.append((score, price, card))
+        scored.append((score, price, row["raw"]))
     if not scored:
         return None, []
     scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
@@ -378,32 +609,71 @@ def choose_best_match(tmpl: CardTemplate, cards: List[dict]) -> Tuple[Optional[d
     return chosen_entry[2], ambiguous
 
 
+def _offline_set_key(value: Optional[str]) -> str:
+    """Compact set key used to filter the offline export ("Phantasmal Flames" -> "phantasmalflames")."""
+    return normalize_set_name(value).replace(" ", "")
+
+
+def read_offline_export() -> Optional[List[dict]]:
+    data = load_json_bytes(OFFLINE_EXPORT.read_bytes())
+    cards = data.get("cards") if isinstance(data, dict) else data
+    if isinstance(cards, dict):
+        cards = cards.get("cards", [])
+    return cards if isinstance(cards, list) else None
+
+
+def offline_shard_path(set_key: str) -> Path:
+    return OFFLINE_SHARD_DIR / f"{quote(set_key, safe='')}.json"
+
+
+def write_offline_shards(shards: Dict[str, List[dict]]) -> None:
+    """Split the export into one file per set so later --set-code runs only parse their own set."""
+    OFFLINE_SHARD_DIR.mkdir(parents=True, exist_ok=True)
+    wanted = set()
+    for set_key, cards in shards.items():
+        path = offline_shard_path(set_key)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(dump_json_bytes(cards))
+        os.replace(tmp, path)
+        wanted.add(path.name)
+    for stale in OFFLINE_SHARD_DIR.glob("*.json"):
+        if stale.name not in wanted:
+            stale.unlink()
+    # the directory mtime marks which export the shards were cut from
+    os.utime(OFFLINE_SHARD_DIR)
+
+
 def load_offline_cards(set_code: Optional[str] = None) -> Optional[List[dict]]:
     """
     Load local PokemonPriceTracker export (ppt_mega_sets.json) to allow offline mapping.
-    Optionally filters by set code/name.
+    Optionally filters by set code/name; the filtered sets are cached as per-set shards under
+    price_oracle/ppt_sets/ (rebuilt whenever the export is newer) so repeat runs skip the full file.
     """
-    fallback_path = Path(__file__).resolve().parent.parent / "price_oracle" / "ppt_mega_sets.json"
-    if not fallback_path.exists():
+    if not OFFLINE_EXPORT.exists():
         return None
     try:
-        data = json.loads(fallback_path.read_text())
-        cards = data.get("cards") if isinstance(data, dict) else data
-        if isinstance(cards, dict):
-            cards = cards.get("cards", [])
-        if not isinstance(cards, list):
-            return None
-        if set_code:
-            target_set = normalize_set_name(set_code)
-            target_compact = target_set.replace(" ", "")
-            filtered: List[dict] = []
-            for c in cards:
-                card_set = normalize_set_name(c.get("setName") or (c.get("set") or {}).get("name") or c.get("setId"))
-                card_compact = card_set.replace(" ", "")
-                if card_set == target_set or card_compact == target_compact:
-                    filtered.append(c)
-            cards = filtered if filtered else cards  # if no match, fall back to full list
-        return cards
+        target_key = _offline_set_key(set_code) if set_code else ""
+        shards_current = (
+            OFFLINE_SHARD_DIR.is_dir() and OFFLINE_SHARD_DIR.stat().st_mtime >= OFFLINE_EXPORT.stat().st_mtime
+        )
+        if target_key and shards_current:
+            shard = offline_shard_path(target_key)
+            if shard.exists():
+                return load_json_bytes(shard.read_bytes())
+        cards = read_offline_export()
+        if cards is None or not target_key:
+            return cards
+        shards: Dict[str, List[dict]] = {}
+        for c in cards:
+            card_key = _offline_set_key(c.get("setName") or (c.get("set") or {}).get("name") or c.get("setId"))
+            if card_key:
+                shards.setdefault(card_key, []).append(c)
+        if not shards_current:
+            try:
+                write_offline_shards(shards)
+            except OSError as exc:
+                print(f"[warn] could not write offline shards to {OFFLINE_SHARD_DIR}: {exc}")
+        return shards.get(target_key) or cards  # if no match, fall back to full list
     except Exception:
         return None
 
@@ -412,9 +682,11 @@ def main():
     parser = argparse.ArgumentParser(description="Map CardTemplate rows to tcgPlayerId using PokemonPriceTracker search.")
     parser.add_argument("--force", action="store_true", help="Re-run mapping even if tcgplayer_id is already set.")
     parser.add_argument("--limit", type=int, default=0, help="Stop after mapping this many templates (0 = all).")
-    parser.add_argument("--sleep", type=float, default=1.25, help="Seconds to sleep between API calls for rate limiting.")
+    parser.add_argument("--sleep", type=float, default=1.25, help="Minimum seconds between API calls (shared by all workers).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of API searches kept in flight.")
     parser.add_argument("--set-code", type=str, default=None, help="Limit mapping to a specific set_code (e.g., meg_web or phantasmal_flames).")
     parser.add_argument("--offline", action="store_true", help="Use local ppt_mega_sets.json instead of live API.")
+    parser.add_argument("--no-cache", action="store_true", help="Re-query the API instead of reusing cached search results.")
     args = parser.parse_args()
 
     if not API_KEY:
@@ -425,38 +697,48 @@ def main():
 
     mapped = 0
     skipped = 0
+    pending_writes = 0
     ambiguous_log: Dict[int, List[str]] = {}
     offline_cards = load_offline_cards(args.set_code) if args.offline else None
     if args.offline and offline_cards is None:
         print("[error] offline mode requested but ppt_mega_sets.json not found or unreadable")
         return
+    offline_rows = prepare_candidate_rows(offline_cards) if offline_cards is not None else None
+    offline_index = build_offline_index(offline_rows) if offline_rows is not None else None
 
-    with Session(engine) as session:
-        existing_ids = {
-            (row.tcgplayer_id, row.template_id)
-            for row in session.exec(select(CardTemplate.tcgplayer_id, CardTemplate.template_id).where(CardTemplate.tcgplayer_id.is_not(None))).all()
-        }
-        mapping_rows = session.exec(select(CardPriceMapping)).all()
-        mappings: Dict[int, CardPriceMapping] = {m.template_id: m for m in mapping_rows}
-        for m in mapping_rows:
-            if getattr(m, "tcgplayer_id", None):
-                existing_ids.add((m.tcgplayer_id, m.template_id))
+    # Loaded templates are used for the whole run; don't expire (and re-SELECT) them on every batch commit.
+    with Session(engine, expire_on_commit=False) as session:
         stmt = select(CardTemplate)
         if args.set_code:
             stmt = stmt.where(CardTemplate.set_code == args.set_code)
         templates = session.exec(stmt).all()
+        if args.set_code:
+            # conflicts are global, so other sets' ids still have to be loaded
+            id_pairs = session.exec(
+                select(CardTemplate.tcgplayer_id, CardTemplate.template_id).where(CardTemplate.tcgplayer_id.is_not(None))
+            ).all()
+        else:
+            id_pairs = [(t.tcgplayer_id, t.template_id) for t in templates if t.tcgplayer_id is not None]
+        mappings: Dict[int, CardPriceMapping] = {m.template_id: m for m in session.exec(select(CardPriceMapping)).all()}
+        id_pairs.extend((m.tcgplayer_id, m.template_id) for m in mappings.values() if getattr(m, "tcgplayer_id", None))
+        # tcgPlayerId -> template ids already holding it
+        existing_by_tcg: Dict[str, Set[int]] = {}
+        for tcg, tid in id_pairs:
+            existing_by_tcg.setdefault(str(tcg), set()).add(tid)
         serial_map = load_serial_map_for_set(args.set_code)
         if serial_map:
-            adjusted = 0
+            serial_updates: List[dict] = []
             for tmpl in templates:
                 expected_serial = serial_map.get(tmpl.template_id)
                 if expected_serial and getattr(tmpl, "serial_number", None) != expected_serial:
-                    tmpl.serial_number = expected_serial
-                    session.add(tmpl)
-                    adjusted += 1
-            if adjusted:
+                    serial_updates.append({"template_id": tmpl.template_id, "serial_number": expected_serial})
+                    # keep the loaded object in sync without marking it dirty (the bulk UPDATE writes it)
+                    set_committed_value(tmpl, "serial_number", expected_serial)
+            if serial_updates:
+                session.bulk_update_mappings(CardTemplate, serial_updates)
                 session.commit()
-                print(f"[info] normalized serial_number for {adjusted} templates using CSV for set={args.set_code}")
+                print(f"[info] normalized serial_number for {len(serial_updates)} templates using CSV for set={args.set_code}")
+        jobs: List[SearchJob] = []
         for tmpl in templates:
             if not tmpl.card_name or tmpl.card_name.lower().startswith("template"):
                 skipped += 1
@@ -471,63 +753,81 @@ def main():
                 )
                 skipped += 1
                 continue
-            rarity_filter = rarity_filter_value(tmpl.rarity)
-            cards = fetch_candidates(term, rarity_filter=rarity_filter, offline_cards=offline_cards)
-            chosen, ambiguous = choose_best_match(tmpl, cards)
-            if not chosen:
-                print(f"[miss] {tmpl.template_id} '{tmpl.card_name}' set='{tmpl.set_name or tmpl.set_code}' query='{term}'")
-            else:
-                tcg_id = chosen.get("tcgPlayerId") or chosen.get("tcgplayerId") or chosen.get("tcg_player_id")
-                price = extract_market_price(chosen, getattr(tmpl, "variant", None))
-                if not tcg_id:
-                    print(f"[miss] {tmpl.template_id} '{tmpl.card_name}' found match without tcgPlayerId")
-                    continue
-                conflict = False
-                for existing_id, existing_tid in existing_ids:
-                    if str(existing_id) == str(tcg_id) and existing_tid != tmpl.template_id:
+            jobs.append((tmpl, term, rarity_filter_value(tmpl.rarity)))
+        limiter = RateLimiter(args.sleep)
+        cache = None if args.offline else ResponseCache(RESPONSE_CACHE_PATH, read=not args.no_cache)
+        results = search_all(jobs, offline_rows, limiter, args.concurrency, cache)
+        try:
+            for (tmpl, term, _), cards in results:
+                if offline_index is not None:
+                    rows = offline_candidates(tmpl, cards, offline_index)
+                else:
+                    rows = prepare_candidate_rows(cards)
+                chosen, ambiguous = choose_best_match(tmpl, rows)
+                if not chosen:
+                    print(f"[miss] {tmpl.template_id} '{tmpl.card_name}' set='{tmpl.set_name or tmpl.set_code}' query='{term}'")
+                else:
+                    tcg_id = chosen.get("tcgPlayerId") or chosen.get("tcgplayerId") or chosen.get("tcg_player_id")
+                    price = extract_market_price(chosen, getattr(tmpl, "variant", None))
+                    if not tcg_id:
+                        print(f"[miss] {tmpl.template_id} '{tmpl.card_name}' found match without tcgPlayerId")
+                        continue
+                    owners = existing_by_tcg.get(str(tcg_id), ())
+                    existing_tid = next((tid for tid in owners if tid != tmpl.template_id), None)
+                    if existing_tid is not None:
                         print(f"[skip-conflict] template={tmpl.template_id} tcgPlayerId={tcg_id} already used by template={existing_tid}")
-                        conflict = True
-                        break
-                if conflict:
-                    skipped += 1
-                    continue
+                        skipped += 1
+                        continue
 
-                tmpl.tcgplayer_id = str(tcg_id)
-                rarity_norm = normalized_rarity(tmpl.rarity)
-                if args.offline and rarity_norm in {"common", "uncommon"}:
-                    price = 0.10
-                if price and price > 0 and (getattr(tmpl, "current_price", 0) <= 0 or args.force or args.offline):
-                    tmpl.current_price = float(price)
-                    tmpl.current_price_updated_at = time.time()
-                    tmpl.cached_price = float(price)
-                    tmpl.cached_price_updated_at = tmpl.current_price_updated_at
-                session.add(tmpl)
-                mapping_entry = mappings.get(tmpl.template_id) or CardPriceMapping(template_id=tmpl.template_id)
-                mapping_entry.tcgplayer_id = str(tcg_id)
-                ppt_id = chosen.get("id") or chosen.get("_id")
-                if ppt_id:
-                    mapping_entry.ppt_id = str(ppt_id)
-                mapping_entry.last_mapped_at = time.time()
-                if not mapping_entry.last_price_fetch_at:
-                    mapping_entry.last_price_fetch_at = mapping_entry.last_mapped_at
-                mapping_entry.fetch_attempt_count = mapping_entry.fetch_attempt_count or 0
-                session.add(mapping_entry)
-                mappings[tmpl.template_id] = mapping_entry
-                existing_ids.add((tmpl.tcgplayer_id, tmpl.template_id))
+                    # --force remaps: the ids this template held before no longer block other templates
+                    previous = mappings.get(tmpl.template_id)
+                    for old_id in {tmpl.tcgplayer_id, getattr(previous, "tcgplayer_id", None)} - {None, str(tcg_id)}:
+                        existing_by_tcg.get(str(old_id), set()).discard(tmpl.template_id)
+                    tmpl.tcgplayer_id = str(tcg_id)
+                    rarity_norm = normalized_rarity(tmpl.rarity)
+                    if args.offline and rarity_norm in {"common", "uncommon"}:
+                        price = 0.10
+                    if price and price > 0 and (getattr(tmpl, "current_price", 0) <= 0 or args.force or args.offline):
+                        tmpl.current_price = float(price)
+                        tmpl.current_price_updated_at = time.time()
+                        tmpl.cached_price = float(price)
+                        tmpl.cached_price_updated_at = tmpl.current_price_updated_at
+                    session.add(tmpl)
+                    mapping_entry = mappings.get(tmpl.template_id) or CardPriceMapping(template_id=tmpl.template_id)
+                    mapping_entry.tcgplayer_id = str(tcg_id)
+                    ppt_id = chosen.get("id") or chosen.get("_id")
+                    if ppt_id:
+                        mapping_entry.ppt_id = str(ppt_id)
+                    mapping_entry.last_mapped_at = time.time()
+                    if not mapping_entry.last_price_fetch_at:
+                        mapping_entry.last_price_fetch_at = mapping_entry.last_mapped_at
+                    mapping_entry.fetch_attempt_count = mapping_entry.fetch_attempt_count or 0
+                    session.add(mapping_entry)
+                    mappings[tmpl.template_id] = mapping_entry
+                    existing_by_tcg.setdefault(tmpl.tcgplayer_id, set()).add(tmpl.template_id)
+                    pending_writes += 1
+                    if pending_writes >= COMMIT_BATCH_SIZE:
+                        session.commit()
+                        pending_writes = 0
+                    mapped += 1
+                    amb_text = f"{len(ambiguous)} other candidates" if ambiguous else "unique"
+                    price_text = f"${price:.2f}" if price else "no-price"
+                    rarity_label = chosen.get("rarityName") or chosen.get("rarity")
+                    serial_label = chosen.get("cardNumber") or chosen.get("number")
+                    print(
+                        f"[mapped] template={tmpl.template_id} -> tcgPlayerId={tcg_id} rarity={rarity_label} serial={serial_label} ({amb_text}, {price_text})"
+                    )
+                    if ambiguous:
+                        ambiguous_log[tmpl.template_id] = [str(a.get('tcgPlayerId') or a.get('name')) for a in ambiguous]
+                if args.limit and mapped >= args.limit:
+                    break
+            if pending_writes:
                 session.commit()
-                mapped += 1
-                amb_text = f"{len(ambiguous)} other candidates" if ambiguous else "unique"
-                price_text = f"${price:.2f}" if price else "no-price"
-                rarity_label = chosen.get("rarityName") or chosen.get("rarity")
-                serial_label = chosen.get("cardNumber") or chosen.get("number")
-                print(
-                    f"[mapped] template={tmpl.template_id} -> tcgPlayerId={tcg_id} rarity={rarity_label} serial={serial_label} ({amb_text}, {price_text})"
-                )
-                if ambiguous:
-                    ambiguous_log[tmpl.template_id] = [str(a.get('tcgPlayerId') or a.get('name')) for a in ambiguous]
-            time.sleep(max(0.0, args.sleep))
-            if args.limit and mapped >= args.limit:
-                break
+        finally:
+            # stop the search workers before closing the cache they write to
+            results.close()
+            if cache:
+                cache.close()
     print(f"[done] mapped={mapped} skipped={skipped} ambiguous={len(ambiguous_log)}")
     if ambiguous_log:
         print("Ambiguous templates (review manually):")
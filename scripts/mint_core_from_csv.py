@@ -8,18 +8,21 @@ Usage: python mint_core_from_csv.py path/to/phantasmal_flames.csv [pack_id]
 """
 import csv as csv_module
 import sys
+import time
 import uuid
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
 from sqlalchemy import func
 from sqlmodel import Session, SQLModel, create_engine, select
 
 sys.path.append(str(Path(__file__).resolve().parents[1] / "backend"))
-from main import CardTemplate, MintRecord, auth_settings  # type: ignore  # noqa: E402
+from import_card_templates import BATCH_SIZE, upsert_templates  # noqa: E402
+from main import MintRecord, auth_settings, engine_options  # type: ignore  # noqa: E402
 
 PACK_TEMPLATE_OFFSETS = {"meg_web": 0, "phantasmal_flames": 2000}
 PACK_NAMES = {"meg_web": "Mega Evolution", "phantasmal_flames": "Phantasmal Flames"}
+CSV_BUFFER_SIZE = 1 << 20
 
 
 def normalize_rarity(value: str) -> str:
@@ -49,11 +52,8 @@ def parse_template_id(row: dict, idx: int, pack_id: str) -> int:
 
 
 def main(csv_path: str, pack_id: str = "meg_web"):
-    engine = create_engine(auth_settings.database_url)
+    engine = create_engine(auth_settings.database_url, **engine_options(auth_settings.database_url))
     SQLModel.metadata.create_all(engine)
-    with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv_module.DictReader(f)
-        templates = list(reader)
 
     created_records = 0
     touched_templates = 0
@@ -62,14 +62,24 @@ def main(csv_path: str, pack_id: str = "meg_web"):
     set_name = PACK_NAMES.get(pack_id, pack_id)
     offset = PACK_TEMPLATE_OFFSETS.get(pack_id, 0)
 
-    with Session(engine) as session:
-        for idx, row in enumerate(templates):
+    pending_mints: List[dict] = []
+    now = time.time()
+    with open(csv_path, newline="", encoding="utf-8", buffering=CSV_BUFFER_SIZE) as f, Session(engine) as session:
+        reader = csv_module.DictReader(f)
+        conn = session.connection()
+        # keyed by template_id: a repeated id keeps its last row (one ON CONFLICT statement may not
+        # touch the same row twice)
+        pending_templates: Dict[int, dict] = {}
+        mint_counts: Dict[int, int] = dict(
+            session.exec(select(MintRecord.template_id, func.count()).group_by(MintRecord.template_id)).all()
+        )
+        for idx, row in enumerate(reader):
             template_id = parse_template_id(row, idx, pack_id)
             name = row.get("card_name") or row.get("name") or row.get("Name") or f"Card {template_id}"
             rarity = row.get("rarity") or row.get("Rarity") or "Common"
             variant = row.get("variant") or row.get("Variant") or row.get("holo_type")
             image_url = row.get("image_url") or row.get("Image URL") or row.get("image") or row.get("Image")
-            tmpl = CardTemplate(
+            pending_templates[template_id] = dict(
                 template_id=template_id,
                 index=idx + 1,
                 card_name=name,
@@ -81,28 +91,36 @@ def main(csv_path: str, pack_id: str = "meg_web"):
                 energy_type=row.get("energy_type"),
                 image_url=image_url,
             )
-            session.merge(tmpl)
+            if len(pending_templates) >= BATCH_SIZE:
+                upsert_templates(conn, list(pending_templates.values()))
+                pending_templates.clear()
             touched_templates += 1
             templates_by_rarity[rarity] = templates_by_rarity.get(rarity, 0) + 1
 
             supply = supply_for_rarity(rarity)
             if supply <= 0:
                 continue
-            existing_count = (
-                session.exec(select(func.count()).where(MintRecord.template_id == template_id)).first() or 0
-            )
+            existing_count = mint_counts.get(template_id, 0)
             missing = max(0, supply - existing_count)
+            mint_counts[template_id] = existing_count + missing
             for _ in range(missing):
-                fake_asset = str(uuid.uuid4())
-                record = MintRecord(
-                    asset_id=fake_asset,
-                    template_id=template_id,
-                    rarity=rarity,
-                    status="available",
+                pending_mints.append(
+                    {
+                        "asset_id": uuid.uuid4().hex,
+                        "template_id": template_id,
+                        "rarity": rarity,
+                        "status": "available",
+                        "updated_at": now,
+                        "is_fake": False,
+                    }
                 )
-                session.add(record)
-                created_records += 1
-                minted_by_rarity[rarity] = minted_by_rarity.get(rarity, 0) + 1
+            if missing:
+                created_records += missing
+                minted_by_rarity[rarity] = minted_by_rarity.get(rarity, 0) + missing
+        if pending_templates:
+            upsert_templates(conn, list(pending_templates.values()))
+        if pending_mints:
+            session.bulk_insert_mappings(MintRecord, pending_mints)
         session.commit()
     print(
         f"Pack '{pack_id}' (offset {offset}) → templ={touched_templates}, new_records={created_records}, csv={csv_path}"
@@ -9,10 +9,16 @@ Requirements:
 from __future__ import annotations
 
 import pathlib
+import queue
 import sys
+import threading
 import time
+from typing import Iterable, Iterator
 
-from sqlmodel import Session
+from sqlalchemy import bindparam, insert, or_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlmodel import Session, select
 
 # Add backend module path
 ROOT = pathlib.Path(__file__).resolve().parents[1]
@@ -21,16 +27,146 @@ sys.path.append(str(ROOT))
 sys.path.append(str(BACKEND))
 
 from main import (  # type: ignore  # noqa: E402
+    _EMPTY,
     Settings,
     CardTemplate,
     MintRecord,
     engine,
-    helius_get_assets,
+    helius_iter_asset_pages,
     template_id_from_uri,
     vault_authority_pda,
     vault_state_pda,
 )
 
+# Ids per IN (...) clause; keeps each query well under driver/SQLite bind-parameter limits.
+IN_CHUNK_SIZE = 1000
+# Rows per upsert statement (7 bind parameters each).
+UPSERT_BATCH_SIZE = 1000
+# Assets buffered from Helius before they are written.
+SYNC_BATCH_SIZE = 10_000
+# Helius pages fetched ahead while the previous batch is being written.
+PREFETCH_PAGES = 2
+UPSERT_DIALECTS = {"postgresql": pg_insert, "sqlite": sqlite_insert}
+# Shared by every synced row.
+STATUS_AVAILABLE = "available"
+UNKNOWN_RARITY = "unknown"
+
+
+def prefetch(pages: Iterable[list], depth: int = PREFETCH_PAGES) -> Iterator[list]:
+    """Drain `pages` on a background thread through a bounded queue, so fetching the next Helius
+    pages overlaps with writing the current batch. Errors from the fetch are re-raised here."""
+    done = object()
+    buffer: queue.Queue = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+        except Exception as exc:  # noqa: BLE001
+            put(exc)
+            return
+        put(done)
+
+    worker = threading.Thread(target=produce, name="helius-prefetch", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # the consumer stopped early (or failed): let the producer exit instead of blocking on a full queue
+        stop.set()
+
+
+def write_mint_records(conn, rows: list[dict]) -> int:
+    """Fallback for dialects without ON CONFLICT: executemany INSERT for new assets, UPDATE for known ones
+    whose owner/status actually changed."""
+    table = MintRecord.__table__
+    ids = [row["asset_id"] for row in rows]
+    existing = {
+        asset_id: (owner, status)
+        for asset_id, owner, status in conn.execute(
+            select(table.c.asset_id, table.c.owner, table.c.status).where(table.c.asset_id.in_(ids))
+        )
+    }
+    inserts = [row for row in rows if row["asset_id"] not in existing]
+    updates = [
+        {"b_asset_id": row["asset_id"], "owner": row["owner"], "status": row["status"], "updated_at": row["updated_at"]}
+        for row in rows
+        if row["asset_id"] in existing and existing[row["asset_id"]] != (row["owner"], row["status"])
+    ]
+    if inserts:
+        conn.execute(insert(table), inserts)
+    if updates:
+        conn.execute(update(table).where(table.c.asset_id == bindparam("b_asset_id")), updates)
+    return len(inserts) + len(updates)
+
+
+def upsert_mint_records(conn, rows: list[dict]) -> int:
+    """INSERT ... ON CONFLICT (asset_id) DO UPDATE owner/status/updated_at for one batch of vault assets.
+
+    Rows already held by the same owner with the same status are left alone, so a repeated sync
+    only rewrites (and WAL-logs) assets whose state actually changed. Returns how many rows were
+    inserted or updated, read back with RETURNING in the same round trip where the database supports it.
+    """
+    insert_fn = UPSERT_DIALECTS.get(conn.dialect.name)
+    if insert_fn is None:
+        return write_mint_records(conn, rows)
+    table = MintRecord.__table__
+    stmt = insert_fn(table).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["asset_id"],
+        set_={key: stmt.excluded[key] for key in ("owner", "status", "updated_at")},
+        where=or_(table.c.owner.is_distinct_from(stmt.excluded.owner), table.c.status != stmt.excluded.status),
+    )
+    if conn.dialect.insert_returning:
+        return len(conn.execute(stmt.returning(table.c.asset_id)).all())
+    return conn.execute(stmt).rowcount
+
+
+def write_batch(db: Session, batch: list[tuple[str, int | None]], rarity_by_tmpl: dict[int, str], owner: str, now: float) -> int:
+    """Resolve rarities for templates not seen yet, then upsert the batch in UPSERT_BATCH_SIZE statements.
+
+    Returns the number of rows inserted or changed.
+    """
+    tmpl_ids = list({tmpl_id for _, tmpl_id in batch if tmpl_id and tmpl_id not in rarity_by_tmpl})
+    for start in range(0, len(tmpl_ids), IN_CHUNK_SIZE):
+        chunk = tmpl_ids[start : start + IN_CHUNK_SIZE]
+        found = db.exec(select(CardTemplate.template_id, CardTemplate.rarity).where(CardTemplate.template_id.in_(chunk)))
+        rarity_by_tmpl.update(found.all())
+    rows = [
+        {
+            "asset_id": asset_id,
+            "template_id": tmpl_id or 0,
+            "rarity": rarity_by_tmpl.get(tmpl_id, UNKNOWN_RARITY) if tmpl_id else UNKNOWN_RARITY,
+            "status": STATUS_AVAILABLE,
+            "owner": owner,
+            "updated_at": now,
+            "is_fake": False,
+        }
+        for asset_id, tmpl_id in batch
+    ]
+    conn = db.connection()
+    written = 0
+    for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+        written += upsert_mint_records(conn, rows[start : start + UPSERT_BATCH_SIZE])
+    return written
+
 
 def sync_inventory() -> dict:
     settings = Settings()
@@ -38,41 +174,44 @@ def sync_inventory() -> dict:
         raise SystemExit("HELIUS_RPC_URL not configured")
     vault_state = vault_state_pda()
     vault_authority = vault_authority_pda(vault_state)
-    assets = helius_get_assets(str(vault_authority), settings.core_collection_address)
-    updated: list[str] = []
+    vault_owner = str(vault_authority)
+    synced = 0
+    written = 0
     now = time.time()
-    with Session(engine) as db:
-        for item in assets:
-            asset_id = item.get("id")
-            if not asset_id:
-                continue
-            content = item.get("content", {}) or {}
-            uri = content.get("json_uri") or content.get("links", {}).get("json")
-            tmpl_id = template_id_from_uri(uri or "")
-            template_row = db.get(CardTemplate, tmpl_id) if tmpl_id else None
-            rarity = template_row.rarity if template_row else "unknown"
-            existing = db.get(MintRecord, asset_id)
-            if existing:
-                existing.owner = str(vault_authority)
-                existing.status = "available"
-                existing.updated_at = now
-                db.add(existing)
-            else:
-                db.add(
-                    MintRecord(
-                        asset_id=asset_id,
-                        template_id=tmpl_id or 0,
-                        rarity=rarity,
-                        status="available",
-                        owner=str(vault_authority),
-                        updated_at=now,
-                    )
-                )
-            updated.append(asset_id)
-        db.commit()
-    return {"vault_authority": str(vault_authority), "synced": len(updated)}
+    # Assets stream in page by page and are written every SYNC_BATCH_SIZE, so memory stays bounded
+    # by the batch rather than the vault size (rarity_by_tmpl grows with the template count only).
+    # One short transaction per batch, so no locks are held while waiting on Helius; the upsert is
+    # idempotent, so a sync that fails part way is simply re-run. With no ORM objects in play there
+    # is nothing for autoflush to do.
+    with Session(engine, autoflush=False) as db:
+        rarity_by_tmpl: dict[int, str] = {}
+        # ids in the current batch; one ON CONFLICT statement may not touch a row twice
+        seen: set[str] = set()
+        batch: list[tuple[str, int | None]] = []
+        for page in prefetch(helius_iter_asset_pages(vault_owner, settings.core_collection_address)):
+            for item in page:
+                asset_id = item.get("id")
+                if not asset_id:
+                    continue
+                synced += 1
+                if asset_id in seen:
+                    continue
+                seen.add(asset_id)
+                content = item.get("content") or _EMPTY
+                links = content.get("links")
+                uri = content.get("json_uri") or (links.get("json") if links else None)
+                batch.append((asset_id, template_id_from_uri(uri or "")))
+            if len(batch) >= SYNC_BATCH_SIZE:
+                with db.begin():
+                    written += write_batch(db, batch, rarity_by_tmpl, vault_owner, now)
+                batch.clear()
+                seen.clear()
+        if batch:
+            with db.begin():
+                written += write_batch(db, batch, rarity_by_tmpl, vault_owner, now)
+    return {"vault_authority": vault_owner, "synced": synced, "written": written}
 
 
 if __name__ == "__main__":
     result = sync_inventory()
-    print(f"Synced {result['synced']} assets for vault {result['vault_authority']}")
+    print(f"Synced {result['synced']} assets ({result['written']} written) for vault {result['vault_authority']}")
@@ -0,0 +1,81 @@
+"""
+Shared Solana RPC client/provider setup for the deposit scripts.
+
+- One AsyncClient per endpoint with Confirmed commitment and an explicit timeout.
+- getLatestBlockhash responses are reused for BLOCKHASH_TTL seconds, so anchorpy
+  does not pay an extra RPC round trip for every transaction it sends.
+- send_with_blockhash_retry drops the cached blockhash and resends once when a
+  transaction is rejected with BlockhashNotFound.
+"""
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from anchorpy import Provider, Wallet
+from solana.rpc.async_api import AsyncClient
+from solana.rpc.commitment import Commitment, Confirmed
+from solana.rpc.types import TxOpts
+
+RPC_TIMEOUT = 30
+# A blockhash stays valid for ~150 slots (~60-90s) and may already be a few seconds old when
+# fetched; reuse it for at most a third of that so signed transactions still have headroom.
+BLOCKHASH_TTL = 20.0
+
+T = TypeVar("T")
+
+
+class BlockhashCachingClient(AsyncClient):
+    """AsyncClient that serves getLatestBlockhash from a short-lived cache."""
+
+    def __init__(self, endpoint: str, commitment: Commitment = Confirmed, timeout: float = RPC_TIMEOUT):
+        super().__init__(endpoint, commitment=commitment, timeout=timeout)
+        self._blockhash: Dict[Optional[Commitment], Tuple[float, object]] = {}
+
+    async def get_latest_blockhash(self, commitment: Optional[Commitment] = None):
+        cached = self._blockhash.get(commitment)
+        now = time.monotonic()
+        if cached and now - cached[0] < BLOCKHASH_TTL:
+            return cached[1]
+        resp = await super().get_latest_blockhash(commitment)
+        self._blockhash[commitment] = (now, resp)
+        return resp
+
+    def invalidate_blockhash(self) -> None:
+        self._blockhash.clear()
+
+
+_clients: Dict[str, BlockhashCachingClient] = {}
+
+
+def get_client(endpoint: str) -> BlockhashCachingClient:
+    """Return the shared client for `endpoint`, creating it on first use."""
+    client = _clients.get(endpoint)
+    if client is None:
+        client = _clients[endpoint] = BlockhashCachingClient(endpoint)
+    return client
+
+
+def make_provider(client: AsyncClient, wallet: Wallet) -> Provider:
+    # solana-py's TxOpts defaults to skip_confirmation=True; keep anchorpy's default of awaiting confirmation.
+    return Provider(client, wallet, opts=TxOpts(skip_confirmation=False, preflight_commitment=Confirmed))
+
+
+def is_blockhash_not_found(exc: Exception) -> bool:
+    text = str(exc)
+    return "BlockhashNotFound" in text or "Blockhash not found" in text
+
+
+async def send_with_blockhash_retry(client: BlockhashCachingClient, send: Callable[[], Awaitable[T]]) -> T:
+    """Await `send()`; if the node rejects the blockhash, refetch it and send once more."""
+    try:
+        return await send()
+    except Exception as exc:  # noqa: BLE001
+        if not is_blockhash_not_found(exc):
+            raise
+    client.invalidate_blockhash()
+    return await send()
+
+
+async def close_clients() -> None:
+    while _clients:
+        _, client = _clients.popitem()
+        await client.close()